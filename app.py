@@ -1,8 +1,21 @@
+import os
+import json
+import logging
+import time
 import streamlit as st
 import pandas as pd
+import numpy as np
 from google.cloud import bigquery
 from google.oauth2 import service_account
 import altair as alt
+import pyarrow as pa
+import pyarrow.compute as pc
+from warehouse import BigQueryWarehouse, DuckDBWarehouse
+
+# Rerun бүрийн эхлэл (time-to-first-chart хэмжилтэд)
+RUN_STARTED = time.perf_counter()
+logging.basicConfig(level=logging.INFO, format="%(asctime)s | %(levelname)s | %(message)s")
+logger = logging.getLogger("dashboard")
 
 # =====================================================
 # PAGE CONFIG (⚠️ ЗААВАЛ ЭХНИЙ МӨРҮҮДИЙН НЭГ БАЙНА)
@@ -19,6 +32,7 @@ HEADLINE_CONFIG = [
     {
         "type": "indicator",
         "code": "rgdp_2005",
+        "agg": "sum",       # жилийн нийлбэр (4 улирал)
         "title": "RGDP 2005",
         "subtitle": "Real GDP (2005 prices)",
         "topic": "gdp"
@@ -26,6 +40,7 @@ HEADLINE_CONFIG = [
     {
         "type": "indicator",
         "code": "rgdp_2010",
+        "agg": "sum",       # жилийн нийлбэр (4 улирал)
         "title": "RGDP 2010",
         "subtitle": "Real GDP (2010 prices)",
         "topic": "gdp"
@@ -33,6 +48,7 @@ HEADLINE_CONFIG = [
     {
         "type": "indicator",
         "code": "rgdp_2015",
+        "agg": "sum",       # жилийн нийлбэр (4 улирал)
         "title": "RGDP 2015",
         "subtitle": "Real GDP (2015 prices)",
         "topic": "gdp"
@@ -40,6 +56,7 @@ HEADLINE_CONFIG = [
     {
         "type": "indicator",
         "code": "ngdp",
+        "agg": "sum",       # жилийн нийлбэр (4 улирал)
         "title": "NGDP",
         "subtitle": "Nominal GDP",
         "topic": "gdp"
@@ -47,12 +64,14 @@ HEADLINE_CONFIG = [
     {
         "type": "indicator",
         "code": "growth",
+        "agg": "mean",      # жилийн дундаж
         "title": "GDP Growth",
         "subtitle": "YoY growth",
         "topic": "gdp"
     },
     {
         "type": "population_total",   # 🔥 indicator_code биш!
+        "agg": "sum",
         "title": "Population",
         "subtitle": "Total population",
         "topic": "population"
@@ -72,43 +91,267 @@ st.success("🔥 APP STARTED — UI rendering OK")
 # =====================================================
 left_col, right_col = st.columns([1.4, 4.6], gap="large")
 # =====================================================
-# HEADLINE DATA LOADER (FILTER-INDEPENDENT)
+# WAREHOUSE (BIGQUERY / LOCAL DUCKDB) — PROCESS-WIDE
 # =====================================================
-@st.cache_data(ttl=3600)
-def load_headline_data():
+@st.cache_resource
+def get_bq_client():
+    # Credential, token, HTTP pool-ийг process-д нэг удаа үүсгээд бүх session хуваалцана
     credentials = service_account.Credentials.from_service_account_info(
         st.secrets["gcp_service_account"]
     )
-    client = bigquery.Client(
+    return bigquery.Client(
         credentials=credentials,
         project=st.secrets["gcp_service_account"]["project_id"]
     )
 
-    query = """
-        SELECT
-            year,
-            indicator_code,
-            value,
-            topic,
-            sex,
-            age_group
-        FROM `mongol-bank-macro-data.Automation_data.fact_macro`
-        WHERE topic IN ('gdp', 'population')
-        ORDER BY year
-        """
-
-    df = client.query(query).to_dataframe()
-
-    # ✅ Python дээр canonical time үүсгэнэ
-    df["year_num"] = df["year"].str[:4].astype(int)
-    df["period"] = (
-    df["year"]
-    .str.extract(r"Q(\d)")
-    .astype("Int64")
-    )
+
+@st.cache_resource
+def get_warehouse():
+    # WAREHOUSE=duckdb үед pipeline-ийн локал файлаас GCP-гүйгээр уншина
+    if os.environ.get("WAREHOUSE") == "duckdb":
+        path = os.environ.get(
+            "WAREHOUSE_PATH",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), "state", "warehouse.duckdb")
+        )
+        return DuckDBWarehouse(path, read_only=True)
+    return BigQueryWarehouse(client_factory=get_bq_client)
 
 
+@st.cache_resource
+def warm_up():
+    # Process эхлэхэд auth token болон холболтыг бэлдэнэ (эхний chart-аас өмнө)
+    started = time.perf_counter()
+    get_warehouse().query_to_dataframe("SELECT 1 AS ok")
+    elapsed = time.perf_counter() - started
+    logger.info(json.dumps({"event": "warehouse_warm_up", "seconds": round(elapsed, 3)}))
+    return elapsed
+
+
+def record_first_chart():
+    # Session бүрийн анхны chart хүртэлх хугацаа (cold/warm process ялгана)
+    if "time_to_first_chart" in st.session_state:
+        return
+    elapsed = time.perf_counter() - RUN_STARTED
+    st.session_state["time_to_first_chart"] = elapsed
+    logger.info(json.dumps({
+        "event": "time_to_first_chart",
+        "seconds": round(elapsed, 3),
+        "warm_up_seconds": round(warm_up(), 3),
+    }))
+    st.caption(f"⏱ Time to first chart: {elapsed:.2f}s")
+
+
+warm_up()
+# =====================================================
+# FACT LOADER (SINGLE QUERY, ARROW)
+# =====================================================
+FACT_TABLE_ID = "mongol-bank-macro-data.Automation_data.fact_macro"
+FACT_TOPICS = ["gdp", "population"]
+FACT_QUERY = f"""
+    SELECT
+        topic,
+        year,
+        indicator_code,
+        value,
+        sex,
+        age_group,
+        year_num,
+        period,
+        freq,
+        period_key
+    FROM `{FACT_TABLE_ID}`
+    WHERE topic IN UNNEST(@topics)
+    ORDER BY topic, period_key
+"""
+# Давтагддаг string багануудыг dictionary (pandas-д categorical) болгоно
+FACT_DICT_COLS = ["topic", "year", "indicator_code", "sex", "age_group", "freq"]
+
+
+@st.cache_resource(ttl=3600)
+def load_facts():
+    # fact_macro-г нэг удаа татаж, topic бүрийн (offset, length)-ийг тэмдэглэнэ
+    table = get_warehouse().query_to_arrow(FACT_QUERY, {"topics": FACT_TOPICS})
+
+    # ORDER BY topic тул topic бүр үргэлжилсэн мөрүүд
+    offsets = {}
+    for topic in FACT_TOPICS:
+        length = pc.sum(pc.equal(table["topic"], topic)).as_py() or 0
+        offsets[topic] = (pc.index(table["topic"], topic).as_py() if length else 0, length)
+
+    for name in FACT_DICT_COLS:
+        i = table.schema.get_field_index(name)
+        if not pa.types.is_dictionary(table.schema.field(i).type):
+            table = table.set_column(i, name, pc.dictionary_encode(table.column(i)))
+    return table, offsets
+
+
+def fact_slice(topic=None):
+    # Arrow slice нь хуулбаргүй (zero-copy)
+    table, offsets = load_facts()
+    if topic is not None:
+        offset, length = offsets[topic]
+        table = table.slice(offset, length)
+
+    df = table.to_pandas()
+    for name in FACT_DICT_COLS:
+        # Category дарааллыг string эрэмбэтэй ижил болгоно (sort/sorted өмнөхтэй адил)
+        col = df[name].cat.remove_unused_categories()
+        df[name] = col.cat.reorder_categories(sorted(col.cat.categories), ordered=True)
     return df
+
+
+# period_key = year * 100 + period (Y үед period = 0) → харуулах label
+PERIOD_LABELS = {
+    "Y": lambda key: f"{key // 100}",
+    "Q": lambda key: f"{key // 100}-Q{key % 100}",
+    "M": lambda key: f"{key // 100}-{key % 100:02d}",
+}
+
+
+def period_label(key, freq):
+    return PERIOD_LABELS[freq](int(key))
+
+
+def time_labels(period_keys, freq):
+    # Label-ийг мөр бүрт биш, зөвхөн unique period_key-ээр үүсгэнэ
+    labels = {key: period_label(key, freq) for key in period_keys.unique()}
+    return period_keys.map(labels)
+
+
+# =====================================================
+# FILTER CUBE (TOPIC × GDP TYPE × FREQ, PROCESS-WIDE)
+# =====================================================
+GDP_PREFIXES = {
+    "RGDP2005": "rgdp_2005",
+    "RGDP2010": "rgdp_2010",
+    "RGDP2015": "rgdp_2015",
+    "NGDP": "ngdp",
+    "GROWTH": "growth"
+}
+FREQ_UNITS = {"Y": "year", "Q": "quarter", "M": "month"}
+# Widget өөрчлөлт бүрийн шүүлтийн төсөв (ms)
+FILTER_BUDGET_MS = float(os.environ.get("FILTER_BUDGET_MS", "10"))
+
+
+class FactCube:
+    # (topic, GDP prefix | None, freq) → period_key-ээр эрэмбэлсэн slice.
+    # Rerun бүрт бүтэн frame-ийг mask-аар шүүхийн оронд dict lookup + searchsorted.
+
+    def __init__(self, frames, prefixes):
+        self.frames = frames
+        self.parts = {}
+        self.period_keys = {}
+        self.indicators = {}
+
+        for topic, df in frames.items():
+            if topic == "population":
+                # Chart-ийн цуврал нэрийг rerun бүрт биш, нэг удаа үүсгэнэ
+                df["Series"] = (
+                    df["sex"].astype(str) + " | " + df["age_group"].astype(str)
+                ).astype("category")
+
+            for prefix in prefixes.get(topic, [None]):
+                rows = df
+                if prefix is not None:
+                    # contains(prefix)-ийг мөр биш category дээр нэг удаа шалгана
+                    codes = [c for c in df["indicator_code"].cat.categories if prefix in c.lower()]
+                    rows = df[df["indicator_code"].isin(codes)]
+                    self.indicators[(topic, prefix)] = sorted(codes)
+
+                for freq, part in rows.groupby("freq", observed=True, sort=False):
+                    part = part.sort_values("period_key", kind="stable").reset_index(drop=True)
+                    keys = part["period_key"].to_numpy()
+                    self.parts[(topic, prefix, freq)] = (part, keys)
+                    self.period_keys[(topic, prefix, freq)] = [int(k) for k in np.unique(keys)]
+
+    def has(self, topic, prefix, freq):
+        return (topic, prefix, freq) in self.parts
+
+    def categories(self, topic, column):
+        # fact_slice category-г эрэмбэлж, ашиглагдаагүйг хассан
+        return list(self.frames[topic][column].cat.categories)
+
+    def select(self, topic, prefix, freq, start, end, filters=None):
+        # [start, end] period_key муж → searchsorted; {багана: утгууд} → category code-оор
+        part, keys = self.parts[(topic, prefix, freq)]
+        lo = keys.searchsorted(start, side="left")
+        hi = keys.searchsorted(end, side="right")
+        rows = part.iloc[lo:hi]
+
+        mask = np.ones(hi - lo, dtype=bool)
+        for column, values in (filters or {}).items():
+            col = rows[column]
+            wanted = col.cat.categories.get_indexer(values)
+            mask &= np.isin(col.cat.codes.to_numpy(), wanted[wanted >= 0])
+        return rows[mask]
+
+
+@st.cache_resource(ttl=3600)
+def load_cube():
+    started = time.perf_counter()
+    cube = FactCube(
+        {topic: fact_slice(topic) for topic in FACT_TOPICS},
+        {"gdp": list(GDP_PREFIXES.values())}
+    )
+    logger.info(json.dumps({
+        "event": "cube_build",
+        "seconds": round(time.perf_counter() - started, 3),
+        "partitions": len(cube.parts),
+    }))
+    return cube
+
+
+# =====================================================
+# HEADLINE DATA LOADER (FILTER-INDEPENDENT)
+# =====================================================
+HEADLINE_AGG = {"sum": "SUM", "mean": "AVG", "first": "ANY_VALUE"}
+POPULATION_TOTAL_LABEL = "Бүгд"
+
+
+def headline_query(config):
+    # Card бүрт нэг SELECT (UNION ALL) → card × жил нэгтгэсэн мөр л буцна
+    params = {"all_label": POPULATION_TOTAL_LABEL}
+    selects = []
+    for i, cfg in enumerate(config):
+        params[f"card_{i}"] = cfg["title"]
+        params[f"topic_{i}"] = cfg["topic"]
+        if cfg["type"] == "indicator":
+            params[f"code_{i}"] = cfg["code"]
+            where = f"STARTS_WITH(LOWER(indicator_code), @code_{i})"
+        else:  # population_total
+            where = "sex = @all_label AND age_group = @all_label"
+        selects.append(f"""
+            SELECT @card_{i} AS card, year_num, {HEADLINE_AGG[cfg.get("agg", "first")]}(value) AS value
+            FROM facts
+            WHERE topic = @topic_{i} AND {where}
+            GROUP BY year_num""")
+
+    sql = f"""
+        WITH facts AS (
+            SELECT
+                topic,
+                indicator_code,
+                sex,
+                age_group,
+                value,
+                year_num
+            FROM `{FACT_TABLE_ID}`
+        )
+        {" UNION ALL ".join(selects)}
+        ORDER BY card, year_num
+    """
+    return sql, params
+
+
+@st.cache_data(ttl=3600)
+def load_headline_data():
+    # card → жилийн цуврал (хэдэн зуун мөр; client дээр string scan хийхгүй)
+    sql, params = headline_query(HEADLINE_CONFIG)
+    df = get_warehouse().query_to_dataframe(sql, params)
+    return {
+        card: group.set_index("year_num")[["value"]]
+        for card, group in df.groupby("card", sort=False)
+    }
 # =====================================================
 # KPI RENDER FUNCTIONS
 # =====================================================
@@ -143,8 +386,7 @@ def render_gdp_kpi(df, gdp_type):
 
 
 def render_pop_kpi(df):
-    latest_period = df["time_label"].max()
-    latest_df = df[df["time_label"] == latest_period]
+    latest_df = df[df["period_key"] == df["period_key"].max()]
 
     if latest_df.empty:
         st.info("No population data")
@@ -152,10 +394,10 @@ def render_pop_kpi(df):
 
     total = latest_df["value"].sum()
 
-    gender = latest_df.groupby("sex")["value"].sum()
+    gender = latest_df.groupby("sex", observed=True)["value"].sum()
     male = gender.get("Эрэгтэй", gender.get("Male", 0))
     female = gender.get("Эмэгтэй", gender.get("Female", 0))
-    age = latest_df.groupby("age_group")["value"].sum().sort_index()
+    age = latest_df.groupby("age_group", observed=True)["value"].sum().sort_index()
     working_age = age.iloc[3:13].sum() if len(age) >= 13 else 0
     dependency = (total - working_age) / working_age * 100 if working_age else 0
 
@@ -184,49 +426,10 @@ with left_col:
         # 1️⃣ topic ЭХЭЛЖ тодорхойлогдоно
         topic = dataset.lower()
 
-    # 2️⃣ load_data FUNCTION (дуудахаас ӨМНӨ)
-    @st.cache_data(ttl=3600)
-    def load_data(topic):
-        credentials = service_account.Credentials.from_service_account_info(
-            st.secrets["gcp_service_account"]
-        )
-        client = bigquery.Client(
-            credentials=credentials,
-            project=st.secrets["gcp_service_account"]["project_id"]
-        )
-
-        query = f"""
-            SELECT
-                year,
-                indicator_code,
-                value,
-                sex,
-                age_group,
-                topic
-            FROM `mongol-bank-macro-data.Automation_data.fact_macro`
-            WHERE topic = '{topic}'
-            ORDER BY year
-        """
-        df = client.query(query).to_dataframe()
-        # ✅ TIME CANONICAL (ЭНД Л БҮГДИЙГ ШИЙДНЭ)
-        if topic == "gdp":
-            # GDP quarterly canonical time
-            df["year_num"] = df["year"].str.split("-").str[0].astype(int)
-            df["period"] = df["year"].str.split("-").str[1].astype("Int64")
-            df["year"] = df["year_num"].astype(str)
-            df["time_freq"] = "Q"
-            df["sex"] = None
-            df["age_group"] = None
-        else:  # population
-            df["year_num"] = df["year"].astype(int)
-            df["period"] = None
-            df["time_freq"] = "Y"
-    
-        return df
-
-    # 3️⃣ DATA LOAD
+    # 2️⃣ DATA LOAD (process-wide cube)
     with st.spinner("⏳ Loading data from BigQuery..."):
-        df = load_data(topic)
+        cube = load_cube()
+        df = cube.frames[topic]
 
 
 
@@ -237,26 +440,12 @@ with left_col:
             st.markdown("### 📊 GDP type")
             gdp_type = st.radio(
                 "",
-                ["RGDP2005", "RGDP2010", "RGDP2015", "NGDP", "GROWTH"],
+                list(GDP_PREFIXES),
                 horizontal=True
             )
     
-        prefix_map = {
-            "RGDP2005": "rgdp_2005",
-            "RGDP2010": "rgdp_2010",
-            "RGDP2015": "rgdp_2015",
-            "NGDP": "ngdp",
-            "GROWTH": "growth"
-        }
-    
-        prefix = prefix_map[gdp_type]
-    
-        available_indicators = sorted(
-            df.loc[
-                df["indicator_code"].str.contains(prefix, case=False, na=False),
-                "indicator_code"
-            ].unique()
-        )
+        prefix = GDP_PREFIXES[gdp_type]
+        available_indicators = cube.indicators.get((topic, prefix), [])
     
         # ✅ Indicators container GDP-ийн ДООР
         with st.container(border=True):
@@ -268,29 +457,27 @@ with left_col:
                 default=available_indicators[:1] if available_indicators else []
             )
     
-        filtered_df = df[df["indicator_code"].isin(selected_indicators)]
+        filters = {"indicator_code": selected_indicators}
+        has_selection = bool(selected_indicators)
     
     # ---------- POPULATION ----------
     else:
+        prefix = None
         sex = st.multiselect(
             "Sex",
-            sorted(df["sex"].dropna().unique()),
+            cube.categories(topic, "sex"),
             default=[]
         )
     
         age_group = st.multiselect(
             "Age group",
-            sorted(df["age_group"].dropna().unique()),
+            cube.categories(topic, "age_group"),
             default=[]
         )
     
-        if sex and age_group:
-            filtered_df = df[
-                df["sex"].isin(sex) &
-                df["age_group"].isin(age_group)
-            ]
-        else:
-            filtered_df = df.copy()
+        # Хоёуланг нь сонгоогүй бол бүх мөр
+        filters = {"sex": sex, "age_group": age_group} if sex and age_group else {}
+        has_selection = True
     #=====================================
     # ⏱ Frequency (GLOBAL, SINGLE)
     #=====================================
@@ -313,130 +500,63 @@ with left_col:
     # ==============================
     # 🔎 DATA-AWARE FILTER (SAFE)
     # ==============================
-    if filtered_df.empty:
+    time_filtered_df = pd.DataFrame()
+    
+    if not has_selection:
         st.warning("⚠️ No data available for selected filters.")
-        time_filtered_df = pd.DataFrame()
     
-    elif selected_freq not in filtered_df["time_freq"].unique():
+    elif not cube.has(topic, prefix, selected_freq):
         st.warning(
             f"⚠️ This dataset does not contain {freq.lower()} data."
         )
-        time_filtered_df = pd.DataFrame()
     
-    else:
-        time_filtered_df = (
-            filtered_df
-            .loc[filtered_df["time_freq"] == selected_freq]
-            .copy()
-        )
     # ⏳ TIME RANGE (FREQUENCY-AWARE)
     # ==============================
-    if not time_filtered_df.empty:
+    else:
     
         with st.container(border=True):
             st.markdown("### ⏳ Time range")
     
-            if selected_freq == "Y":
-                year_list = sorted(time_filtered_df["year"].unique())
-            
-                start_y = st.selectbox(
-                    "Start year",
-                    year_list,
-                    index=0
-                )
-            
-                end_y = st.selectbox(
-                    "End year",
-                    year_list,
-                    index=len(year_list) - 1
-                )
-            
-                # 🔒 SAFETY CHECK
-                if start_y > end_y:
-                    st.error("❌ Start year must be before End year")
-                    time_filtered_df = pd.DataFrame()
-                else:
-                    time_filtered_df = time_filtered_df[
-                        (time_filtered_df["year"] >= start_y) &
-                        (time_filtered_df["year"] <= end_y)
-                    ]
-
-            elif selected_freq == "Q":
-                time_filtered_df["t"] = (
-                    time_filtered_df["year"].astype(str)
-                    + "-Q"
-                    + time_filtered_df["period"].astype(str)
-                )
-            
-                t_list = sorted(time_filtered_df["t"].unique())
-            
-                start_q = st.selectbox("Start quarter", t_list, index=0)
-                end_q = st.selectbox("End quarter", t_list, index=len(t_list)-1)
-            
-                if start_q > end_q:
-                    st.error("❌ Start quarter must be before End quarter")
-                    time_filtered_df = pd.DataFrame()
-                else:
-                    time_filtered_df = time_filtered_df[
-                        (time_filtered_df["t"] >= start_q) &
-                        (time_filtered_df["t"] <= end_q)
-                    ]
-
-            elif selected_freq == "M":
-                # 🧱 Temporary time key
-                time_filtered_df["t"] = (
-                    time_filtered_df["year"].astype(str)
-                    + "-"
-                    + time_filtered_df["period"].astype(str).str.zfill(2)
-                )
-            
-                t_list = sorted(time_filtered_df["t"].unique())
-            
-                start_m = st.selectbox("Start month", t_list, index=0)
-                end_m = st.selectbox("End month", t_list, index=len(t_list) - 1)
-            
-                # 🔒 SAFETY CHECK
-                if start_m > end_m:
-                    st.error("❌ Start month must be before End month")
-                    time_filtered_df = pd.DataFrame()
-                else:
-                    time_filtered_df = time_filtered_df[
-                        (time_filtered_df["t"] >= start_m) &
-                        (time_filtered_df["t"] <= end_m)
-                    ]
-                                # 🧹 REMOVE TEMP COLUMN
-    time_filtered_df = time_filtered_df.drop(columns=["t"], errors="ignore")
-    
-    # =============================
-    # CREATE TIME LABEL (STANDARD)
-    # =============================
-    if not time_filtered_df.empty:
-    
-        if selected_freq == "Y":
-            time_filtered_df["time_label"] = time_filtered_df["year"].astype(str)
-    
-        elif selected_freq == "Q":
-            time_filtered_df["time_label"] = (
-                time_filtered_df["year"].astype(str)
-                + "-Q"
-                + time_filtered_df["period"].astype(str)
+            # period_key (int) дээр шүүнэ, label-ийг зөвхөн харуулахад
+            unit = FREQ_UNITS[selected_freq]
+            key_list = cube.period_keys[(topic, prefix, selected_freq)]
+        
+            start_k = st.selectbox(
+                f"Start {unit}",
+                key_list,
+                index=0,
+                format_func=lambda k: period_label(k, selected_freq)
             )
-    
-        elif selected_freq == "M":
-            time_filtered_df["time_label"] = (
-                time_filtered_df["year"].astype(str)
-                + "-"
-                + time_filtered_df["period"].astype(str).str.zfill(2)
+            end_k = st.selectbox(
+                f"End {unit}",
+                key_list,
+                index=len(key_list) - 1,
+                format_func=lambda k: period_label(k, selected_freq)
             )
+        
+            # 🔒 SAFETY CHECK
+            if start_k > end_k:
+                st.error(f"❌ Start {unit} must be before End {unit}")
+            else:
+                filter_started = time.perf_counter()
+                time_filtered_df = cube.select(
+                    topic, prefix, selected_freq, start_k, end_k, filters
+                )
+                # =============================
+                # CREATE TIME LABEL (STANDARD)
+                # =============================
+                time_filtered_df["time_label"] = time_labels(
+                    time_filtered_df["period_key"], selected_freq
+                )
+                filter_ms = (time.perf_counter() - filter_started) * 1000
+                log = logger.warning if filter_ms > FILTER_BUDGET_MS else logger.info
+                log(json.dumps({
+                    "event": "filter_latency",
+                    "ms": round(filter_ms, 2),
+                    "rows": len(time_filtered_df),
+                    "partition": [topic, prefix, selected_freq],
+                }))
 
-    # ---------- SERIES COLUMN (POPULATION) ----------
-    if topic == "population":
-        time_filtered_df = time_filtered_df.copy()
-        time_filtered_df["Series"] = (
-            time_filtered_df["sex"].astype(str)
-            + " | "
-            + time_filtered_df["age_group"].astype(str)
-        )
     # ================= RIGHT COLUMN =================
     with right_col:
         with st.container(border=True):
@@ -464,11 +584,13 @@ with left_col:
                                 index="time_label",
                                 columns="indicator_code",
                                 values="value",
-                                aggfunc="mean"
+                                aggfunc="mean",
+                                observed=True
                             )
                         )
                 
                         st.line_chart(chart_df)
+                        record_first_chart()
 
                 # ===== POPULATION =====
                 else:
@@ -489,6 +611,7 @@ with left_col:
                         .properties(height=400)
                     )
                     st.altair_chart(chart, use_container_width=True)
+                    record_first_chart()
 
           # ===== DOWNLOAD OVERLAY (BOTTOM-RIGHT, ULTRA MINIMAL) =====
             st.markdown(
@@ -529,14 +652,15 @@ with left_col:
                 unsafe_allow_html=True
             )
             
-            st.download_button(
-                label="↓",
-                data=plot_df.to_csv(index=False),
-                file_name="main_chart_data.csv",
-                mime="text/csv",
-                help="Download chart data",
-                key="main_chart_download"
-            )
+            if not time_filtered_df.empty:
+                st.download_button(
+                    label="↓",
+                    data=plot_df.to_csv(index=False),
+                    file_name="main_chart_data.csv",
+                    mime="text/csv",
+                    help="Download chart data",
+                    key="main_chart_download"
+                )
         # =====================================================
         # KPI CONTAINER (BELOW MAIN CHART)
         # =====================================================
@@ -572,17 +696,12 @@ with left_col:
             if df_nz.empty:
                 st.info("No non-zero GDP growth data.")
             else:
-                latest_row = (
-                    df_nz
-                    .sort_values(["year_num", "period"])
-                    .iloc[-1]
-                )
-        
-                latest_label = f"{latest_row['year_num']}-Q{int(latest_row['period'])}"
+                latest_key = df_nz["period_key"].max()
+                latest_label = period_label(latest_key, selected_freq)
         
                 sector_df = (
                     time_filtered_df[
-                        (time_filtered_df["time_label"] == latest_label)
+                        (time_filtered_df["period_key"] == latest_key)
                         & time_filtered_df["indicator_code"].str.startswith("growth_")
                     ][["indicator_code", "value"]]
                     .copy()
@@ -620,13 +739,14 @@ with left_col:
         # =====================================================
         elif topic == "population" and not time_filtered_df.empty:
         
-            latest_label = time_filtered_df["time_label"].max()
+            latest_key = time_filtered_df["period_key"].max()
+            latest_label = period_label(latest_key, selected_freq)
         
             pop_df = (
                 time_filtered_df[
-                    time_filtered_df["time_label"] == latest_label
+                    time_filtered_df["period_key"] == latest_key
                 ]
-                .groupby("Series")["value"]
+                .groupby("Series", observed=True)["value"]
                 .sum()
                 .reset_index()
                 .sort_values("value", ascending=False)
@@ -681,57 +801,8 @@ for row in rows:
                 </div>
                 """, unsafe_allow_html=True)
 
-                # ===== GDP INDICATOR (SMART HEADLINE) =====
-                if cfg["type"] == "indicator":
-                
-                    base_df = headline_df[
-                        headline_df["indicator_code"]
-                        .fillna("")
-                        .str.lower()
-                        .str.startswith(cfg["code"])
-                    ].copy()
-                
-                    # 🔥 RGDP / NGDP → yearly SUM (4 улирал)
-                    if cfg["code"] in ["rgdp_2005", "rgdp_2010", "rgdp_2015", "ngdp"]:
-                        plot_df = (
-                            base_df
-                            .groupby("year", as_index=True)["value"]
-                            .sum()
-                            .to_frame()
-                            .sort_index()
-                        )
-                
-                    # 🔥 GROWTH → yearly MEAN
-                    elif cfg["code"] == "growth":
-                        plot_df = (
-                            base_df
-                            .groupby("year_num", as_index=True)["value"]
-                            .mean()
-                            .to_frame()
-                            .sort_index()
-                        )
-                
-                    # fallback (аюулгүй)
-                    else:
-                        plot_df = (
-                            base_df
-                            .drop_duplicates(subset=["year_num"])
-                            .set_index("year_num")[["value"]]
-                            .sort_index()
-                        )
-
-
-                # ===== POPULATION TOTAL =====
-                elif cfg["type"] == "population_total":
-                    plot_df = (
-                        headline_df[
-                            (headline_df["topic"] == "population") &
-                            (headline_df["sex"] == "Бүгд") &
-                            (headline_df["age_group"] == "Бүгд")
-                        ]
-                        .set_index("year_num")[["value"]]
-                        .sort_index()
-                    )
+                # RGDP / NGDP → жилийн SUM, GROWTH → жилийн MEAN (server дээр)
+                plot_df = headline_df.get(cfg["title"], pd.DataFrame({"value": []}))
 
                 st.line_chart(plot_df, height=160)
                 
@@ -743,24 +814,21 @@ with st.expander("📄 Raw data"):
     # ===================== GDP =====================
     if topic == "gdp":
     
-        raw_prefix = prefix_map[gdp_type]
+        raw_prefix = GDP_PREFIXES[gdp_type]
     
         # ✅ ЯГ ЭНД — FILTER ОРООГҮЙ ЭХ ӨГӨГДӨЛ
         raw_df = df.copy()
         
         # ✅ CANONICAL TIME_LABEL (RAW-д ЗААВАЛ НЭГ УДАА)
-        raw_df["time_label"] = (
-            raw_df["year"]
-            + "-Q"
-            + raw_df["period"].astype(str)
-        )
+        raw_df["time_label"] = time_labels(raw_df["period_key"], "Q")
         df_pivot = (
             raw_df
             .pivot_table(
                 index="time_label",
                 columns="indicator_code",
                 values="value",
-                aggfunc="mean"
+                aggfunc="mean",
+                observed=True
             )
             .reset_index()
         )
@@ -782,7 +850,8 @@ with st.expander("📄 Raw data"):
                 index=["sex", "age_group"],
                 columns="year",
                 values="value",
-                aggfunc="sum"
+                aggfunc="sum",
+                observed=True
             )
             .reset_index()
         )
@@ -0,0 +1,85 @@
+# =========================================================
+# BENCHMARK: EXCEL EXPORT MEMORY (PANDAS vs STREAMED)
+# =========================================================
+# python benchmarks/bench_excel.py [--rows 10000 50000 200000] [--cols 56]
+#
+# Хэмжилт бүрийг тусдаа process-д ажиллуулна (peak RSS нь process-ийн
+# түвшний, буурдаггүй үзүүлэлт). pandas.to_excel-ийн санах ой мөрийн тоотой
+# хамт өсдөг бол export_excel (constant_memory) тогтмол байх ёстой.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+def peak_rss_mb():
+    if resource is None:
+        return float("nan")
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def wide_frame(rows, cols):
+    # GDP sheet-тэй төстэй: хугацааны багана + float үзүүлэлтүүд
+    rng = np.random.default_rng(0)
+    wide = pd.DataFrame(rng.random((rows, cols)), columns=[f"ind_{i}" for i in range(cols)])
+    wide.insert(0, "ОН", [f"{2000 + i // 4}-{i % 4 + 1}" for i in range(rows)])
+    return wide
+
+
+def run_child(mode, rows, cols):
+    from data_automation import export_excel
+
+    wide = wide_frame(rows, cols)
+    baseline = peak_rss_mb()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.xlsx")
+        started = time.perf_counter()
+        if mode == "pandas":
+            with pd.ExcelWriter(path, engine="xlsxwriter") as writer:
+                wide.to_excel(writer, sheet_name="GDP", index=False)
+        else:
+            export_excel({"GDP": wide}, path)
+        wall = time.perf_counter() - started
+    print(f"{wall:.2f} {peak_rss_mb() - baseline:.1f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Excel export memory benchmark")
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 50_000, 200_000])
+    parser.add_argument("--cols", type=int, default=56)
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "ROWS"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.child:
+        run_child(args.child[0], int(args.child[1]), args.cols)
+        return
+
+    print(f"{'rows':>8}  {'pandas.to_excel':>22}  {'export_excel':>22}")
+    for rows in args.rows:
+        cells = []
+        for mode in ("pandas", "streamed"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", mode, str(rows), "--cols", str(args.cols)],
+                check=True, capture_output=True, text=True
+            ).stdout.split()
+            cells.append(f"{float(out[0]):>8.1f}s {float(out[1]):>8.0f} MB")
+        print(f"{rows:>8}  {cells[0]:>22}  {cells[1]:>22}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# =========================================================
+# BENCHMARK: JSON-STAT DECODE (SYNTHETIC CUBES)
+# =========================================================
+# python benchmarks/bench_jsonstat.py [--cells 1e5 1e6 1e7] [--legacy-max 1e6]
+#
+# Хуучин мөр бүрийн loop (baseline) болон векторжуулсан
+# jsonstat_to_dataframe-ийг ижил synthetic cube дээр харьцуулна.
+
+import argparse
+import itertools
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from data_automation import jsonstat_to_dataframe  # noqa: E402
+
+
+def legacy_jsonstat_to_dataframe(data):
+    # Baseline decoder: нүд бүрт dict үүсгэнэ
+    dimensions = data["dimension"]
+    values = data["value"]
+    dim_names = data["id"]
+
+    dim_labels = {}
+    dim_sizes = []
+    for dim in dim_names:
+        labels = dimensions[dim]["category"]["label"]
+        dim_labels[dim] = list(labels.values())
+        dim_sizes.append(len(labels))
+
+    rows = []
+    for idx, combo in enumerate(itertools.product(*[range(s) for s in dim_sizes])):
+        row = {}
+        for i, dim in enumerate(dim_names):
+            row[dim] = dim_labels[dim][combo[i]]
+        row["DTVAL_CO"] = values[idx]
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def synthetic_cube(n_cells, seed=0):
+    # ОН × Бүрэлдэхүүн × Үзүүлэлт; ОН-ийн тоогоор нүдний тоог тааруулна
+    n_components, n_stats = 20, 10
+    n_periods = max(1, int(n_cells) // (n_components * n_stats))
+    sizes = [n_periods, n_components, n_stats]
+    names = ["ОН", "Бүрэлдэхүүн", "Статистик үзүүлэлт"]
+
+    dimension = {}
+    for name, size in zip(names, sizes):
+        codes = [str(i) for i in range(size)]
+        dimension[name] = {"category": {
+            "index": codes,
+            "label": {code: f"{name} {code}" for code in codes},
+        }}
+
+    rng = np.random.default_rng(seed)
+    values = rng.random(int(np.prod(sizes))).round(3).tolist()
+    return {"id": names, "size": sizes, "dimension": dimension, "value": values}
+
+
+def timed(func, data, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        df = func(data)
+        best = min(best, time.perf_counter() - started)
+    return best, len(df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="JSON-stat decode benchmark")
+    parser.add_argument("--cells", type=float, nargs="+", default=[1e5, 1e6, 1e7])
+    parser.add_argument("--legacy-max", type=float, default=1e6,
+                        help="Үүнээс их cube дээр хуучин loop-ийг алгасна")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    print(f"{'cells':>10}  {'legacy':>10}  {'vectorized':>10}  {'speedup':>8}")
+    for cells in args.cells:
+        data = synthetic_cube(cells)
+        new_s, rows = timed(jsonstat_to_dataframe, data, args.repeat)
+        if rows <= args.legacy_max:
+            old_s, _ = timed(legacy_jsonstat_to_dataframe, data, 1)
+            legacy, speedup = f"{old_s:.3f}s", f"{old_s / new_s:.0f}x"
+        else:
+            legacy, speedup = "n/a", ""
+        print(f"{rows:>10}  {legacy:>10}  {new_s:>9.3f}s  {speedup:>8}")
+
+
+if __name__ == "__main__":
+    main()
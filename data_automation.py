@@ -2,17 +2,34 @@
 # GDP AUTOMATION PIPELINE (PRODUCTION)
 # =========================================================
 
-import requests
+import numpy as np
 import pandas as pd
-import itertools
+from pandas.api.types import union_categoricals
 from urllib.parse import quote
 import logging
+import random
 from datetime import datetime
+from email.utils import parsedate_to_datetime
 import os
 import sys
-from google.cloud import bigquery
-from google.oauth2 import service_account
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Callable, Optional
+from urllib.parse import urlparse
 import json
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+import gzip
+import hashlib
+import asyncio
+
+from warehouse import BigQueryWarehouse, DuckDBWarehouse
 
 # ---------------------------------------------------------
 # PATHS
@@ -20,305 +37,2179 @@ import json
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 OUTPUT_DIR = os.path.join(BASE_DIR, "output")
 LOG_DIR = os.path.join(BASE_DIR, "logs")
-
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(LOG_DIR, exist_ok=True)
+CACHE_DIR = os.path.join(BASE_DIR, "cache", "http")
+STATE_DIR = os.path.join(BASE_DIR, "state")
+SNAPSHOT_FILE = os.path.join(STATE_DIR, "fact_macro_snapshot.parquet")
+FINGERPRINT_FILE = os.path.join(STATE_DIR, "fingerprints.json")
+VINTAGE_DIR = os.path.join(STATE_DIR, "vintages")
+VINTAGE_SNAPSHOT_DIR = os.path.join(STATE_DIR, "vintage_snapshots")
+BACKFILL_DIR = os.path.join(OUTPUT_DIR, "backfill")
+BACKFILL_CHECKPOINT = os.path.join(STATE_DIR, "backfill_checkpoint.json")
 
 # ---------------------------------------------------------
 # LOGGING
 # ---------------------------------------------------------
 log_file = os.path.join(LOG_DIR, "pipeline.log")
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-    handlers=[
-        logging.FileHandler(log_file),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+
+def setup_logging():
+    # Import хийхэд файл/хавтас үүсгэхгүй, зөвхөн pipeline ажиллахад тохируулна
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    os.makedirs(LOG_DIR, exist_ok=True)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+        handlers=[
+            logging.FileHandler(log_file),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
+# ---------------------------------------------------------
+# STAGE PROFILING
+# ---------------------------------------------------------
+_stage_records = []
+_stage_lock = threading.Lock()
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: byte
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+@contextmanager
+def stage(name, **labels):
+    # wall / CPU (тухайн thread) хугацаа, peak RSS, мөрийн тоог бүртгэнэ
+    record = {"stage": name, **labels, "rows": None}
+    rss_before = _peak_rss_mb()
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    try:
+        yield record
+    finally:
+        record["wall_s"] = round(time.perf_counter() - wall0, 4)
+        record["cpu_s"] = round(time.thread_time() - cpu0, 4)
+        record["peak_rss_mb"] = _peak_rss_mb()
+        if rss_before is not None:
+            record["peak_rss_growth_mb"] = round(record["peak_rss_mb"] - rss_before, 1)
+        with _stage_lock:
+            _stage_records.append(record)
+        logging.info(json.dumps({"event": "stage", **record}, ensure_ascii=False))
+
+
+def log_run_summary(statuses):
+    logging.info("📋 Run summary:")
+    for name, status in statuses.items():
+        logging.info(f"   {name:<12} {status}")
+    logging.info(json.dumps({"event": "run_summary", "datasets": statuses}, ensure_ascii=False))
+
+
+def log_stage_summary():
+    with _stage_lock:
+        records = list(_stage_records)
+    if not records:
+        return
+
+    summary = (
+        pd.DataFrame(records)
+        .groupby("stage", sort=False)
+        .agg(
+            calls=("wall_s", "size"),
+            wall_s=("wall_s", "sum"),
+            cpu_s=("cpu_s", "sum"),
+            rows=("rows", "sum"),
+            peak_rss_mb=("peak_rss_mb", "max"),
+        )
+        .round(4)
+        .astype({"rows": "int64"})
+    )
+    logging.info("⏱ Stage summary:\n" + summary.to_string())
+    logging.info(json.dumps(
+        {"event": "stage_summary", "stages": summary.reset_index().to_dict("records")},
+        ensure_ascii=False,
+        default=float
+    ))
+
 
 TIMEOUT = 30
 
+NSO_API_URL = "https://data.1212.mn/api/v1/mn/NSO"
+
+# Зэрэг татах тохиргоо
+FETCH_MAX_WORKERS = int(os.environ.get("FETCH_MAX_WORKERS", 6))
+FETCH_PER_HOST_LIMIT = int(os.environ.get("FETCH_PER_HOST_LIMIT", 4))
+
+# Retry / backoff тохиргоо
+HTTP_MAX_RETRIES = int(os.environ.get("HTTP_MAX_RETRIES", 4))
+HTTP_BACKOFF_BASE = float(os.environ.get("HTTP_BACKOFF_BASE", 0.5))
+HTTP_BACKOFF_MAX = float(os.environ.get("HTTP_BACKOFF_MAX", 30))
+HTTP_TIMEOUT_BUDGET = float(os.environ.get("HTTP_TIMEOUT_BUDGET", 120))
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# PxWeb API нэг хүсэлтэд буцаах нүдний дээд хязгаар
+PXWEB_MAX_CELLS = int(os.environ.get("PXWEB_MAX_CELLS", 100_000))
+
+# On-disk HTTP cache (TTL дотор сүлжээ ашиглахгүй, дараа нь ETag/Last-Modified-аар шалгана)
+HTTP_CACHE_ENABLED = os.environ.get("HTTP_CACHE_ENABLED", "1") == "1"
+HTTP_CACHE_TTL = float(os.environ.get("HTTP_CACHE_TTL", 6 * 3600))
+HTTP_CACHE_MAX_BYTES = int(os.environ.get("HTTP_CACHE_MAX_BYTES", 200 * 1024 * 1024))
+
+# ---------------------------------------------------------
+# BIGQUERY AUTH (LAZY)
+# ---------------------------------------------------------
+_bq_client = None
+_bq_client_lock = threading.Lock()
+
+
+def get_credentials():
+    if "DATA_SERVICE_ACCOUNT_KEY" not in os.environ:
+        raise EnvironmentError("❌ DATA_SERVICE_ACCOUNT_KEY secret олдсонгүй")
+
+    from google.oauth2 import service_account
+
+    credentials_info = json.loads(os.environ["DATA_SERVICE_ACCOUNT_KEY"])
+    return service_account.Credentials.from_service_account_info(credentials_info)
+
+
+def get_bq_client():
+    # google-cloud import болон auth-ыг зөвхөн load хийх үед л хийнэ
+    global _bq_client
+    with _bq_client_lock:
+        if _bq_client is None:
+            from google.cloud import bigquery
+            _bq_client = bigquery.Client(credentials=get_credentials())
+        return _bq_client
+
+
+# "bigquery" эсвэл "duckdb" (GCP-гүй локал туршилт, WAREHOUSE_PATH файлд)
+WAREHOUSE = os.environ.get("WAREHOUSE", "bigquery")
+WAREHOUSE_PATH = os.environ.get("WAREHOUSE_PATH", os.path.join(STATE_DIR, "warehouse.duckdb"))
+_warehouse = None
+_warehouse_lock = threading.Lock()
+
+
+def get_warehouse(kind=None):
+    global _warehouse
+    with _warehouse_lock:
+        if _warehouse is None:
+            if (kind or WAREHOUSE) == "duckdb":
+                os.makedirs(os.path.dirname(WAREHOUSE_PATH), exist_ok=True)
+                _warehouse = DuckDBWarehouse(WAREHOUSE_PATH)
+            else:
+                _warehouse = BigQueryWarehouse(client_factory=get_bq_client)
+        return _warehouse
+
+
+def is_bigquery():
+    return isinstance(get_warehouse(), BigQueryWarehouse)
+
+
+FACT_TABLE_ID = "mongol-bank-macro-data.Automation_data.fact_macro"
+STAGING_TABLE_ID = "mongol-bank-macro-data.Automation_data.fact_macro_staging"
+# Layout солих үеийн түр хүснэгт (fact_macro + suffix)
+FACT_MIGRATE_SUFFIX = "_migrate"
+
+# fact_macro мөрийг давтагдашгүй тодорхойлох түлхүүр
+FACT_KEY_COLS = ["topic", "indicator_code", "year", "sex", "age_group"]
+
+# Schema-г pandas-аас таахгүй, тодорхой зааж өгнө
+FACT_FIELDS = [
+    ("topic", "STRING"),
+    ("indicator_code", "STRING"),
+    ("year", "STRING"),
+    ("period_date", "DATE"),
+    # Dashboard string задлахгүйн тулд хугацааг төрөлжүүлж бичнэ
+    ("year_num", "INT64"),
+    ("period", "INT64"),
+    ("freq", "STRING"),
+    ("period_key", "INT64"),
+    ("sex", "STRING"),
+    ("age_group", "STRING"),
+    ("value", "FLOAT64"),
+    ("source", "STRING"),
+    ("loaded_at", "TIMESTAMP"),
+]
+FACT_COLS = [name for name, _ in FACT_FIELDS]
+FACT_TIME_COLS = ["year_num", "period", "freq", "period_key"]
+FACT_PARTITION_FIELD = "period_date"
+FACT_CLUSTERING = ["topic", "indicator_code"]
+
+# Append-only түүх: NSO засварласан нүд бүр vintage_date-тэй шинэ мөр болно
+VINTAGE_TABLE_ID = "mongol-bank-macro-data.Automation_data.fact_macro_vintage"
+VINTAGE_FIELDS = [
+    (name, field_type) for name, field_type in FACT_FIELDS
+    if name != "source" and name not in FACT_TIME_COLS
+] + [("vintage_date", "DATE")]
+VINTAGE_COLS = [name for name, _ in VINTAGE_FIELDS]
+VINTAGE_PARTITION_FIELD = "vintage_date"
+VINTAGE_CLUSTERING = ["indicator_code", "year"]
+# Vintage бичих өдөр бүрийн бүтэн төлөв (key бүрийн сүүлийн утга) — as-of нэг partition уншина
+VINTAGE_SNAPSHOT_TABLE_ID = "mongol-bank-macro-data.Automation_data.fact_macro_vintage_snapshot"
+VINTAGE_SNAPSHOT_FIELD = "snapshot_date"
+VINTAGE_SNAPSHOT_FIELDS = VINTAGE_FIELDS + [(VINTAGE_SNAPSHOT_FIELD, "DATE")]
+VINTAGE_SNAPSHOT_COLS = [name for name, _ in VINTAGE_SNAPSHOT_FIELDS]
+
+# Load арга: "job" (load_table_from_dataframe) эсвэл "storage-write" (Arrow stream)
+LOADER = os.environ.get("LOADER", "job")
+STORAGE_WRITE_MODE = os.environ.get("STORAGE_WRITE_MODE", "pending")
+# AppendRows хүсэлтийн 10MB хязгаараас доош байлгана
+STORAGE_WRITE_MAX_BYTES = int(os.environ.get("STORAGE_WRITE_MAX_BYTES", 8 * 1024 * 1024))
+
+
+def fact_schema():
+    from google.cloud import bigquery
+    return [bigquery.SchemaField(name, field_type) for name, field_type in FACT_FIELDS]
+
+
+def fact_partitioning():
+    from google.cloud import bigquery
+    return bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.YEAR,
+        field=FACT_PARTITION_FIELD
+    )
+
+# ---------------------------------------------------------
+# HTTP SESSION (POOLED, RETRY)
+# ---------------------------------------------------------
+class HttpMetrics:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.cache_hits = 0
+        self.cache_revalidated = 0
+        self.cache_misses = 0
+
+    def record(self, latency):
+        with self._lock:
+            self.requests += 1
+            self.latencies.append(latency)
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def summary(self):
+        with self._lock:
+            lat = np.array(self.latencies) if self.latencies else np.zeros(1)
+            return {
+                "requests": self.requests,
+                "retries": self.retries,
+                "failures": self.failures,
+                "cache_hits": self.cache_hits,
+                "cache_revalidated": self.cache_revalidated,
+                "cache_misses": self.cache_misses,
+                "latency_p50": round(float(np.percentile(lat, 50)), 3),
+                "latency_p95": round(float(np.percentile(lat, 95)), 3),
+                "latency_max": round(float(lat.max()), 3),
+            }
+
+
+http_metrics = HttpMetrics()
+
+_session = None
+_session_lock = threading.Lock()
+
+# host → энэ хугацаа хүртэл хүсэлт илгээхгүй (rate limit)
+_rate_limited_until = {}
+
+
+def get_session():
+    # requests-ийг decoder ашиглах үед import хийхгүйн тулд энд л ачаална
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=max(FETCH_MAX_WORKERS, FETCH_PER_HOST_LIMIT)
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _header_seconds(value):
+    # Retry-After: секунд эсвэл HTTP огноо
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _rate_limit_wait(response):
+    if response is None:
+        return None
+
+    retry_after = _header_seconds(response.headers.get("Retry-After"))
+    if retry_after is not None:
+        return retry_after
+
+    if response.headers.get("X-RateLimit-Remaining") == "0":
+        reset = _header_seconds(response.headers.get("X-RateLimit-Reset"))
+        # Reset нь epoch секунд эсвэл үлдсэн секунд байж болно
+        if reset is not None and reset > 1e9:
+            reset = max(0.0, reset - time.time())
+        return reset
+    return None
+
+
+def _backoff_delay(attempt):
+    # Exponential backoff + full jitter
+    return random.uniform(0, min(HTTP_BACKOFF_MAX, HTTP_BACKOFF_BASE * 2 ** attempt))
+
+
+def http_request(method, url, **kwargs):
+    import requests
+
+    host = urlparse(url).netloc
+    deadline = time.monotonic() + HTTP_TIMEOUT_BUDGET
+    session = get_session()
+    attempt = 0
+
+    while True:
+        wait = _rate_limited_until.get(host, 0) - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.Timeout(f"{method} {url}: {HTTP_TIMEOUT_BUDGET}s хугацаа дууслаа")
+
+        response, error = None, None
+        started = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=min(TIMEOUT, remaining), **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as exc:
+            error = exc
+        http_metrics.record(time.perf_counter() - started)
+
+        rate_wait = _rate_limit_wait(response)
+        if response is not None and response.status_code not in RETRY_STATUS:
+            if rate_wait:
+                _rate_limited_until[host] = time.monotonic() + rate_wait
+            response.raise_for_status()
+            return response
+
+        attempt += 1
+        delay = rate_wait if rate_wait is not None else _backoff_delay(attempt)
+        reason = response.status_code if response is not None else type(error).__name__
+
+        if attempt > HTTP_MAX_RETRIES or time.monotonic() + delay >= deadline:
+            http_metrics.count("failures")
+            logging.error(f"❌ {method} {url}: {reason}, {attempt} оролдлого амжилтгүй")
+            if response is not None:
+                response.raise_for_status()
+            raise error
+
+        http_metrics.count("retries")
+        logging.warning(
+            f"🔁 {method} {url}: {reason}, {delay:.1f}s дараа дахин оролдоно "
+            f"({attempt}/{HTTP_MAX_RETRIES})"
+        )
+        time.sleep(delay)
+
+
+def log_http_metrics():
+    logging.info(f"📈 HTTP metrics: {json.dumps(http_metrics.summary())}")
+
+
 # ---------------------------------------------------------
-# BIGQUERY AUTH
+# HTTP CACHE (ON-DISK, COMPRESSED)
 # ---------------------------------------------------------
-if "DATA_SERVICE_ACCOUNT_KEY" not in os.environ:
-    raise EnvironmentError("❌ DATA_SERVICE_ACCOUNT_KEY secret олдсонгүй")
+_cache_evict_lock = threading.Lock()
+
+
+def _cache_key(table_path, payload):
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(f"{table_path}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+def _cache_paths(key):
+    return (
+        os.path.join(CACHE_DIR, f"{key}.json.gz"),
+        os.path.join(CACHE_DIR, f"{key}.meta.json"),
+    )
+
+
+def _atomic_write(path, data):
+    tmp = f"{path}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _cache_read(key):
+    body_path, meta_path = _cache_paths(key)
+    try:
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(body_path, "rb") as f:
+            body = gzip.decompress(f.read())
+        # LRU: хандсан хугацааг mtime-аар хадгална (өөр thread evict хийсэн байж болно)
+        os.utime(body_path)
+    except (OSError, ValueError):
+        return None, None
+    return meta, body
+
+
+def _cache_write(key, meta, body=None):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    body_path, meta_path = _cache_paths(key)
+    if body is not None:
+        _atomic_write(body_path, gzip.compress(body))
+    _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+
+
+def _cache_evict():
+    with _cache_evict_lock:
+        entries = []
+        for name in os.listdir(CACHE_DIR):
+            if name.endswith(".json.gz"):
+                path = os.path.join(CACHE_DIR, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, name[: -len(".json.gz")]))
 
-credentials_info = json.loads(os.environ["DATA_SERVICE_ACCOUNT_KEY"])
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= HTTP_CACHE_MAX_BYTES:
+                break
+            for path in _cache_paths(key):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            total -= size
 
-credentials = service_account.Credentials.from_service_account_info(
-    credentials_info
-)
 
-bq_client = bigquery.Client(credentials=credentials)
+def cached_request(method, table_path, payload=None):
+    url = nso_url(table_path)
+    if not HTTP_CACHE_ENABLED:
+        return http_request(method, url, json=payload).json()
+
+    key = _cache_key(table_path, payload)
+    meta, body = _cache_read(key)
+
+    if meta is not None and time.time() - meta["stored_at"] < HTTP_CACHE_TTL:
+        http_metrics.count("cache_hits")
+        return json.loads(body)
+
+    headers = {}
+    if meta is not None:
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    r = http_request(method, url, json=payload, headers=headers)
+
+    if r.status_code == 304 and meta is not None:
+        http_metrics.count("cache_revalidated")
+        meta["stored_at"] = time.time()
+        _cache_write(key, meta)
+        return json.loads(body)
+
+    http_metrics.count("cache_misses")
+    _cache_write(key, {
+        "url": url,
+        "etag": r.headers.get("ETag"),
+        "last_modified": r.headers.get("Last-Modified"),
+        "stored_at": time.time(),
+    }, r.content)
+    _cache_evict()
+    return r.json()
+
 
 # ---------------------------------------------------------
 # FUNCTIONS
 # ---------------------------------------------------------
-def get_table_metadata(table_path):
+def nso_url(table_path):
     encoded_path = quote(table_path, safe="/")
-    url = f"https://data.1212.mn/api/v1/mn/NSO/{encoded_path}"
-    r = requests.get(url, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
+    return f"{NSO_API_URL}/{encoded_path}"
+
+
+def get_table_metadata(table_path):
+    return cached_request("GET", table_path)
 
 
 def get_nso_data(table_path, payload):
-    encoded_path = quote(table_path, safe="/")
-    url = f"https://data.1212.mn/api/v1/mn/NSO/{encoded_path}"
-    r = requests.post(url, json=payload, timeout=TIMEOUT)
-    r.raise_for_status()
-    return r.json()
+    return cached_request("POST", table_path, payload)
+
+
+def _dimension_categories(dimension):
+    category = dimension["category"]
+    labels = category.get("label", {})
+    index = category.get("index")
+
+    # json-stat2: index нь list эсвэл {code: position} dict байж болно
+    if index is None:
+        codes = list(labels.keys())
+    elif isinstance(index, dict):
+        codes = sorted(index, key=index.get)
+    else:
+        codes = list(index)
+
+    return [labels.get(code, code) for code in codes]
+
+
+def _dense_array(raw, n, dtype, fill):
+    # json-stat2 sparse хэлбэр: {"<flat index>": value}
+    if isinstance(raw, dict):
+        arr = np.full(n, fill, dtype=dtype)
+        if raw:
+            idx = np.fromiter((int(k) for k in raw.keys()), dtype=np.int64, count=len(raw))
+            arr[idx] = np.array(list(raw.values()), dtype=dtype)
+        return arr
+    return np.array(raw, dtype=dtype)
 
 
 def jsonstat_to_dataframe(data):
-    dimensions = data["dimension"]
-    values = data["value"]
     dim_names = data["id"]
+    dimensions = data["dimension"]
 
-    dim_labels = {}
-    dim_sizes = []
+    dim_labels = [_dimension_categories(dimensions[dim]) for dim in dim_names]
+    dim_sizes = data.get("size") or [len(labels) for labels in dim_labels]
+    n_cells = int(np.prod(dim_sizes, dtype=np.int64))
 
-    for dim in dim_names:
-        labels = dimensions[dim]["category"]["label"]
-        dim_labels[dim] = list(labels.values())
-        dim_sizes.append(len(labels))
+    columns = {}
+    for i, (dim, labels) in enumerate(zip(dim_names, dim_labels)):
+        size = dim_sizes[i]
+        inner = int(np.prod(dim_sizes[i + 1:], dtype=np.int64))
+        outer = int(np.prod(dim_sizes[:i], dtype=np.int64))
 
-    rows = []
-    for idx, combo in enumerate(itertools.product(*[range(s) for s in dim_sizes])):
-        row = {}
-        for i, dim in enumerate(dim_names):
-            row[dim] = dim_labels[dim][combo[i]]
-        row["DTVAL_CO"] = values[idx]
-        rows.append(row)
+        # Давхардсан label-ийг нэг category болгон нэгтгэнэ
+        order = pd.unique(np.array(labels, dtype=object))
+        position = {label: pos for pos, label in enumerate(order)}
+        remap = np.array([position[label] for label in labels], dtype=np.int32)
 
-    return pd.DataFrame(rows)
+        codes = np.tile(np.repeat(remap[:size], inner), outer)
+        columns[dim] = pd.Categorical.from_codes(codes, categories=order)
 
+    values = data.get("value", [])
+    columns["DTVAL_CO"] = _dense_array(values, n_cells, np.float64, np.nan)
 
-def pivot_validate(df, mapping, label):
-    if "Бүрэлдэхүүн" not in df.columns:
-        raise KeyError(f"{label}: 'Бүрэлдэхүүн' багана олдсонгүй")
+    status = data.get("status")
+    if status is not None:
+        if isinstance(status, str):
+            status_arr = np.full(n_cells, status, dtype=object)
+        else:
+            status_arr = _dense_array(status, n_cells, object, None)
+        columns["status"] = pd.Categorical(status_arr)
 
-    df["component"] = df["Бүрэлдэхүүн"].replace(mapping)
+    return pd.DataFrame(columns, copy=False)
 
-    pv = (
-        df.pivot_table(
-            index="ОН",
-            columns="component",
-            values="DTVAL_CO",
-            aggfunc="first"
-        )
-        .reset_index()
+
+# ---------------------------------------------------------
+# CONCURRENT FETCH
+# ---------------------------------------------------------
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _host_semaphore(url):
+    host = urlparse(url).netloc
+    with _host_semaphores_lock:
+        if host not in _host_semaphores:
+            _host_semaphores[host] = threading.BoundedSemaphore(FETCH_PER_HOST_LIMIT)
+        return _host_semaphores[host]
+
+
+@dataclass(frozen=True)
+class FetchJob:
+    table_path: str
+    payload: dict
+    decode: Callable = jsonstat_to_dataframe
+    # Өмнөх ажиллагааны fingerprint-тэй ижил бол decode алгасна
+    previous_fingerprint: Optional[str] = None
+
+
+@dataclass
+class FetchResult:
+    frame: Optional[pd.DataFrame]
+    fingerprint: str
+    timing: dict
+    # Decode алгассан үед түүхий хариуг хадгална
+    raw: Optional[dict] = None
+
+    @property
+    def unchanged(self):
+        return self.frame is None
+
+
+def fingerprint(data):
+    # Түлхүүрийн дарааллаас хамааралгүй hash
+    canonical = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _fetch_and_decode(name, job):
+    with stage("fetch", job=name) as fetched:
+        with _host_semaphore(nso_url(job.table_path)):
+            data = get_nso_data(job.table_path, job.payload)
+        digest = fingerprint(data)
+
+    if digest == job.previous_fingerprint:
+        timing = {"fetch_s": fetched["wall_s"], "decode_s": 0.0, "rows": 0}
+        return FetchResult(None, digest, timing, raw=data)
+
+    # Хариу ирмэгц decode хийнэ (бусад татал зэрэг үргэлжилнэ)
+    with stage("decode", job=name) as decoded:
+        df = job.decode(data)
+        decoded["rows"] = len(df)
+
+    timing = {
+        "fetch_s": fetched["wall_s"],
+        "decode_s": decoded["wall_s"],
+        "rows": len(df),
+    }
+    return FetchResult(df, digest, timing)
+
+
+def fetch_many(jobs, max_workers=None):
+    # jobs: {name: FetchJob} → {name: FetchResult}
+    max_workers = max_workers or FETCH_MAX_WORKERS
+    results = {}
+    started = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(_fetch_and_decode, name, job): name
+            for name, job in jobs.items()
+        }
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+
+    logging.info(
+        f"🌐 {len(jobs)} хүсэлт зэрэг татагдлаа: {time.perf_counter() - started:.2f}s"
     )
+    return results
 
-    ordered_cols = ["ОН"] + list(mapping.values())
-    pv = pv.reindex(columns=ordered_cols)
-    pv = pv.fillna(0)
 
-    if pv.empty:
-        raise ValueError(f"{label} pivot хоосон байна")
+# ---------------------------------------------------------
+# PERIOD
+# ---------------------------------------------------------
+def add_time_columns(df, freq):
+    # "2024", "2024-3", "2024-Q3" → period_date (эхний өдөр), year_num, period,
+    # freq, period_key = year_num * 100 + period (жилийн өгөгдөлд period NULL, key = year_num * 100)
+    parts = df["year"].astype(str).str.extract(r"^(\d{4})(?:\D*(\d{1,2}))?")
+    year_num = parts[0].astype(float)
+    period = parts[1].astype(float) if freq != "Y" else pd.Series(np.nan, index=df.index)
+    first_period = period.fillna(1)
+
+    if freq == "Q":
+        month = (first_period - 1) * 3 + 1
+    elif freq == "M":
+        month = first_period
+    else:
+        month = pd.Series(1.0, index=df.index)
 
-    missing = set(ordered_cols) - set(pv.columns)
-    if missing:
-        raise ValueError(f"{label} pivot багана дутуу: {missing}")
+    df["period_date"] = pd.to_datetime(
+        pd.DataFrame({"year": year_num, "month": month, "day": 1}),
+        errors="coerce"
+    ).dt.date
+    df["year_num"] = year_num.astype("Int64")
+    df["period"] = period.astype("Int64")
+    df["freq"] = freq
+    df["period_key"] = (year_num * 100 + period.fillna(0)).astype("Int64")
+    return df
 
-    logging.info(f"📊 {label} pivot OK")
-    return pv
 
 # ---------------------------------------------------------
-# MAIN PIPELINE
+# EXCEL EXPORT (STREAMING)
 # ---------------------------------------------------------
-def main():
-    logging.info("🚀 GDP pipeline эхэллээ")
+EXCEL_CHUNK_ROWS = int(os.environ.get("EXCEL_CHUNK_ROWS", 5000))
 
-    table_path = "Economy, environment/National Accounts/DT_NSO_0500_022V1.px"
-    metadata = get_table_metadata(table_path)
+# pandas.to_excel-ийн header загвартай ижил
+EXCEL_HEADER_FORMAT = {"bold": True, "border": 1, "align": "center", "valign": "top"}
 
-    def build_query(stat_code):
-        query = {"query": [], "response": {"format": "json-stat2"}}
-        for var in metadata["variables"]:
-            if var["text"] == "Статистик үзүүлэлт":
-                query["query"].append({
-                    "code": var["code"],
-                    "selection": {"filter": "item", "values": [stat_code]}
-                })
-            else:
-                query["query"].append({
-                    "code": var["code"],
-                    "selection": {"filter": "item", "values": var["values"]}
-                })
-        return query
-
-    # === MAPS ===
-    ngdp_map = {
-        "ДНБ": "ngdp",
-        "Хөдөө аж ахуй, ойн аж ахуй, загас барилт, ан агнуур": "ngdp_agri",
-        "Уул уурхай, олборлолт": "ngdp_mine",
-        "Боловсруулах үйлдвэрлэл": "ngdp_manu",
-        "Цахилгаан, хий, уур, агааржуулалт": "ngdp_elec",
-        "Барилга": "ngdp_cons",
-        "Бөөний болон жижиглэн худалдаа, машин, мотоциклийн засвар, үйлчилгээ": "ngdp_trad",
-        "Тээвэр ба агуулахын үйл ажиллагаа": "ngdp_tran",
-        "Мэдээлэл, холбоо": "ngdp_info",
-        "Үйлчилгээний бусад үйл ажиллагаа": "ngdp_oser",
-        "Бүтээгдэхүүний цэвэр татвар": "ngdp_taxe"
-    }
-    
-    df_ngdp = jsonstat_to_dataframe(get_nso_data(table_path, build_query("0")))
-    pv_ngdp = pivot_validate(df_ngdp, ngdp_map, "NGDP")
-    # ===================== RGDP by 2005 =====================
-    rgdp_2005_map = {k: f"rgdp_2005{v[4:]}" for k, v in ngdp_map.items()}
-    
-    df_rgdp_2005 = jsonstat_to_dataframe(get_nso_data(table_path, build_query("1")))
-    pv_rgdp_2005 = pivot_validate(df_rgdp_2005, rgdp_2005_map, "RGDP 2005")
-    
-    # ===================== RGDP by 2010 =====================
-    rgdp_2010_map = {k: f"rgdp_2010{v[4:]}" for k, v in ngdp_map.items()}
-    
-    df_rgdp_2010 = jsonstat_to_dataframe(get_nso_data(table_path, build_query("2")))
-    pv_rgdp_2010 = pivot_validate(df_rgdp_2010, rgdp_2010_map, "RGDP 2010")
-    
-    # ===================== RGDP by 2015 =====================
-    rgdp_2015_map = {k: f"rgdp_2015{v[4:]}" for k, v in ngdp_map.items()}
-    
-    df_rgdp_2015 = jsonstat_to_dataframe(get_nso_data(table_path, build_query("3")))
-    pv_rgdp_2015 = pivot_validate(df_rgdp_2015, rgdp_2015_map, "RGDP 2015")
-
-    # ===================== GROWTH =====================
-    growth_map = {k: f"growth{v[4:]}" for k, v in ngdp_map.items()}
-    
-    df_growth = jsonstat_to_dataframe(get_nso_data(table_path, build_query("6")))
-    pv_growth = pivot_validate(df_growth, growth_map, "GDP Growth")
-        # ===================== POPULATION =====================
-    pop_table_path = "Population, household/1_Population, household/DT_NSO_0300_003V1.px"
-
-    pop_payload = {
-        "query": [
-            {"code": "Хүйс", "selection": {"filter": "item", "values": ["0", "1", "2"]}},
-            {"code": "Насны бүлэг", "selection": {"filter": "item", "values": [str(i) for i in range(16)]}},
-            {"code": "Он", "selection": {"filter": "item", "values": [str(i) for i in range(40)]}},
-        ],
-        "response": {"format": "json-stat2"}
+
+def excel_row_chunks(df, chunk_rows=None):
+    # NaN → None (хоосон нүд); chunk бүрийг л Python объект болгоно
+    chunk_rows = chunk_rows or EXCEL_CHUNK_ROWS
+    for start in range(0, len(df), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].astype(object)
+        yield chunk.where(chunk.notna(), None).to_numpy().tolist()
+
+
+def export_excel(wide_frames, output_file, chunk_rows=None):
+    # constant_memory: мөр бүр бичигдмэгц диск рүү flush хийгдэнэ (санах ой тогтмол)
+    import xlsxwriter
+
+    workbook = xlsxwriter.Workbook(output_file, {"constant_memory": True})
+    header_format = workbook.add_format(EXCEL_HEADER_FORMAT)
+    rows = 0
+    try:
+        for sheet, wide in wide_frames.items():
+            worksheet = workbook.add_worksheet(sheet)
+            worksheet.write_row(0, 0, [str(c) for c in wide.columns], header_format)
+            row = 1
+            for chunk in excel_row_chunks(wide, chunk_rows):
+                for values in chunk:
+                    worksheet.write_row(row, 0, values)
+                    row += 1
+            rows += row - 1
+    finally:
+        workbook.close()
+    return rows
+
+
+# ---------------------------------------------------------
+# PARQUET EXPORT
+# ---------------------------------------------------------
+PARQUET_DICT_COLS = ["indicator_code", "year", "freq", "sex", "age_group", "source"]
+
+
+def export_parquet(final_long, run_date):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    path = os.path.join(OUTPUT_DIR, f"fact_macro_{run_date}")
+    table = pa.Table.from_pandas(final_long[FACT_COLS], preserve_index=False)
+
+    pq.write_to_dataset(
+        table,
+        root_path=path,
+        partition_cols=["topic"],
+        compression="zstd",
+        use_dictionary=PARQUET_DICT_COLS,
+        existing_data_behavior="delete_matching"
+    )
+    logging.info(f"🗂 Parquet dataset бичигдлээ → {path}")
+    return path
+
+
+# ---------------------------------------------------------
+# LOAD (FULL / DELTA)
+# ---------------------------------------------------------
+def _key_frame(df):
+    # NULL түлхүүрийг (GDP-ийн sex/age_group) харьцуулахын тулд "" болгоно
+    return df[FACT_KEY_COLS].astype(object).where(df[FACT_KEY_COLS].notna(), "")
+
+
+def diff_against_snapshot(df, snapshot, label="Delta"):
+    new_keys = _key_frame(df)
+    old = _key_frame(snapshot)
+    old["_old_value"] = snapshot["value"].to_numpy()
+    old = old.drop_duplicates(subset=FACT_KEY_COLS, keep="last")
+
+    merged = new_keys.merge(old, on=FACT_KEY_COLS, how="left", indicator=True)
+    new_values = df["value"].to_numpy(dtype=float)
+    old_values = merged["_old_value"].to_numpy(dtype=float)
+
+    inserted = (merged["_merge"] == "left_only").to_numpy()
+    both_nan = np.isnan(new_values) & np.isnan(old_values)
+    changed = ~inserted & (new_values != old_values) & ~both_nan
+
+    logging.info(
+        f"🔍 {label}: {int(inserted.sum())} шинэ, {int(changed.sum())} өөрчлөгдсөн, "
+        f"{len(df) - int(inserted.sum()) - int(changed.sum())} өөрчлөлтгүй мөр"
+    )
+    return df.loc[inserted | changed]
+
+
+def read_snapshot():
+    if not os.path.exists(SNAPSHOT_FILE):
+        return None
+    return pd.read_parquet(SNAPSHOT_FILE)
+
+
+def write_snapshot(df):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{SNAPSHOT_FILE}.tmp"
+    df[FACT_KEY_COLS + ["value"]].to_parquet(tmp, index=False)
+    os.replace(tmp, SNAPSHOT_FILE)
+
+
+def fact_rebuild_sql(source_id, target_id, existing_cols, partitioning_spec):
+    # Хуучин мөрүүдийг шинэ layout/schema-тай target-д буулгана (байхгүй багана NULL)
+    select = ",\n            ".join(
+        f"CAST({name} AS {field_type}) AS {name}" if name in existing_cols
+        else f"CAST(NULL AS {field_type}) AS {name}"
+        for name, field_type in FACT_FIELDS
+    )
+    return f"""
+        CREATE TABLE `{target_id}`
+        PARTITION BY DATE_TRUNC({partitioning_spec.field}, {partitioning_spec.type_})
+        CLUSTER BY {", ".join(FACT_CLUSTERING)}
+        AS SELECT
+            {select}
+        FROM `{source_id}`
+    """
+
+
+def migrate_table(bq_client, table, partitioning_spec):
+    # Partition / cluster тохиргоог (CREATE OR REPLACE-ээр ч) өөрчлөх боломжгүй тул
+    # шинэ layout-ыг түр хүснэгтэд бэлдээд, хуучныг устгаж, оронд нь хуулна.
+    # Хүснэгтгүй үе нь зөвхөн DROP → copy job хооронд.
+    table_id = f"{table.project}.{table.dataset_id}.{table.table_id}"
+    migrate_id = f"{table_id}{FACT_MIGRATE_SUFFIX}"
+    existing = {field.name for field in table.schema}
+    logging.warning(f"🧱 {table_id}: partition/cluster тохиргоо өөр → {migrate_id}-ээр дахин үүсгэнэ")
+
+    bq_client.delete_table(migrate_id, not_found_ok=True)
+    bq_client.query(fact_rebuild_sql(table_id, migrate_id, existing, partitioning_spec)).result()
+
+    bq_client.delete_table(table_id)
+    try:
+        bq_client.copy_table(migrate_id, table_id).result()
+    except Exception:
+        logging.error(f"❌ {table_id} сэргээгдсэнгүй; өгөгдөл {migrate_id}-д үлдсэн")
+        raise
+    bq_client.delete_table(migrate_id, not_found_ok=True)
+    logging.info(f"🧱 {table_id} шинэ layout-аар солигдлоо (partition: period_date, cluster: {FACT_CLUSTERING})")
+
+
+def ensure_fact_table(table_id=FACT_TABLE_ID):
+    from google.cloud import bigquery
+    from google.api_core.exceptions import NotFound
+
+    # Шинээр үүсгэсэн / дахин үүсгэсэн / багана нэмсэн бол True (full load шаардлагатай)
+    bq_client = get_bq_client()
+    partitioning_spec = fact_partitioning()
+    try:
+        table = bq_client.get_table(table_id)
+    except NotFound:
+        table = None
+
+    if table is not None:
+        partitioning = table.time_partitioning
+        same_layout = (
+            partitioning is not None
+            and partitioning.field == partitioning_spec.field
+            and partitioning.type_ == partitioning_spec.type_
+            and list(table.clustering_fields or []) == FACT_CLUSTERING
+        )
+        if same_layout:
+            existing = {field.name for field in table.schema}
+            missing = [field for field in fact_schema() if field.name not in existing]
+            if not missing:
+                return False
+            table.schema = list(table.schema) + missing
+            bq_client.update_table(table, ["schema"])
+            logging.info(f"🧱 {table_id}: багана нэмлээ {[f.name for f in missing]}")
+            return True
+
+        migrate_table(bq_client, table, partitioning_spec)
+        return True
+
+    table = bigquery.Table(table_id, schema=fact_schema())
+    table.time_partitioning = partitioning_spec
+    table.clustering_fields = FACT_CLUSTERING
+    bq_client.create_table(table)
+    logging.info(f"🧱 {table_id} үүсгэлээ (partition: period_date, cluster: {FACT_CLUSTERING})")
+    return True
+
+
+def load_job_config(write_disposition, partitioned=True):
+    from google.cloud import bigquery
+
+    config = bigquery.LoadJobConfig(
+        schema=fact_schema(),
+        write_disposition=write_disposition
+    )
+    if partitioned:
+        config.time_partitioning = fact_partitioning()
+        config.clustering_fields = FACT_CLUSTERING
+    return config
+
+
+# ---------------------------------------------------------
+# STORAGE WRITE API (ARROW)
+# ---------------------------------------------------------
+_ALREADY_EXISTS = 6  # google.rpc.Code.ALREADY_EXISTS
+
+
+def fact_arrow_schema():
+    import pyarrow as pa
+
+    types = {
+        "STRING": pa.string(),
+        "DATE": pa.date32(),
+        "FLOAT64": pa.float64(),
+        "INT64": pa.int64(),
+        "TIMESTAMP": pa.timestamp("us", tz="UTC"),
     }
+    return pa.schema([(name, types[field_type]) for name, field_type in FACT_FIELDS])
+
+
+def arrow_batches(table, max_bytes=None):
+    # Сериалчилсан batch бүр max_bytes-аас хэтрэхгүй байхаар хуваана
+    max_bytes = max_bytes or STORAGE_WRITE_MAX_BYTES
+    table = table.combine_chunks()
+    if table.num_rows == 0:
+        return []
+
+    row_bytes = max(1, table.nbytes // table.num_rows)
+    rows_per_batch = max(1, max_bytes // row_bytes)
+
+    batches = []
+    pending = list(table.to_batches(max_chunksize=rows_per_batch))
+    while pending:
+        batch = pending.pop(0)
+        if batch.serialize().size > max_bytes and batch.num_rows > 1:
+            half = batch.num_rows // 2
+            pending[:0] = [batch.slice(0, half), batch.slice(half)]
+        else:
+            batches.append(batch)
+    return batches
+
+
+def _append_with_retry(write_client, append_requests):
+    from google.api_core import exceptions as gexc
+
+    retryable = (
+        gexc.ServiceUnavailable, gexc.DeadlineExceeded,
+        gexc.InternalServerError, gexc.Aborted
+    )
+    acked, attempt = 0, 0
+    while acked < len(append_requests):
+        try:
+            for response in write_client.append_rows(iter(append_requests[acked:])):
+                # Offset аль хэдийн бичигдсэн бол (retry) давхар бичихгүй
+                if response.error.code not in (0, _ALREADY_EXISTS):
+                    raise RuntimeError(f"❌ AppendRows алдаа: {response.error.message}")
+                acked += 1
+            if acked < len(append_requests):
+                # Алдаагүй ч дутуу хаагдсан stream-ийг retry-д тооцно (хязгааргүй давталтгүй)
+                raise gexc.Aborted(f"AppendRows stream {acked}/{len(append_requests)} ack-тай хаагдлаа")
+        except gexc.AlreadyExists:
+            acked += 1
+        except retryable as exc:
+            attempt += 1
+            if attempt > HTTP_MAX_RETRIES:
+                raise
+            delay = _backoff_delay(attempt)
+            logging.warning(
+                f"🔁 AppendRows: {type(exc).__name__}, offset {acked}-аас "
+                f"{delay:.1f}s дараа дахин илгээнэ ({attempt}/{HTTP_MAX_RETRIES})"
+            )
+            time.sleep(delay)
+    return acked
+
+
+def storage_write_dataframe(df, table_id, mode=None, write_client=None, max_bytes=None):
+    # Arrow record batch-уудыг Storage Write API-аар offset-той (exactly-once) бичнэ
+    import pyarrow as pa
+    from google.cloud.bigquery_storage_v1 import types
+
+    mode = mode or STORAGE_WRITE_MODE
+    if write_client is None:
+        from google.cloud import bigquery_storage_v1
+        write_client = bigquery_storage_v1.BigQueryWriteClient(credentials=get_credentials())
+
+    project, dataset, table_name = table_id.split(".")
+    parent = write_client.table_path(project, dataset, table_name)
+    stream_type = (
+        types.WriteStream.Type.PENDING if mode == "pending"
+        else types.WriteStream.Type.COMMITTED
+    )
+    stream = write_client.create_write_stream(
+        parent=parent,
+        write_stream=types.WriteStream(type_=stream_type)
+    )
+
+    schema = fact_arrow_schema()
+    table = pa.Table.from_pandas(df[FACT_COLS], schema=schema, preserve_index=False)
+    serialized_schema = types.ArrowSchema(serialized_schema=schema.serialize().to_pybytes())
+
+    append_requests, offset = [], 0
+    for batch in arrow_batches(table, max_bytes):
+        append_requests.append(types.AppendRowsRequest(
+            write_stream=stream.name,
+            offset=offset,
+            arrow_rows=types.AppendRowsRequest.ArrowData(
+                writer_schema=serialized_schema,
+                rows=types.ArrowRecordBatch(
+                    serialized_record_batch=batch.serialize().to_pybytes(),
+                    row_count=batch.num_rows
+                )
+            )
+        ))
+        offset += batch.num_rows
+
+    _append_with_retry(write_client, append_requests)
+    write_client.finalize_write_stream(name=stream.name)
+
+    if mode == "pending":
+        # Бүх batch нэг дор (atomic) commit хийгдэнэ
+        response = write_client.batch_commit_write_streams(
+            types.BatchCommitWriteStreamsRequest(parent=parent, write_streams=[stream.name])
+        )
+        if response.stream_errors:
+            raise RuntimeError(f"❌ Storage Write commit алдаа: {response.stream_errors}")
+
+    logging.info(
+        f"☁️ Storage Write ({mode}): {offset} мөр, {len(append_requests)} batch → {table_id}"
+    )
+    return offset
+
+
+def ensure_staging_table(table_id=STAGING_TABLE_ID):
+    from google.cloud import bigquery
+    bq_client = get_bq_client()
+    bq_client.create_table(bigquery.Table(table_id, schema=fact_schema()), exists_ok=True)
+
 
-    df_population = jsonstat_to_dataframe(
-        get_nso_data(pop_table_path, pop_payload)
+def replace_from_staging_sql(target, staging, columns=None):
+    cols = ", ".join(columns or FACT_COLS)
+    return f"""
+        BEGIN TRANSACTION;
+        DELETE FROM `{target}` WHERE TRUE;
+        INSERT INTO `{target}` ({cols}) SELECT {cols} FROM `{staging}`;
+        COMMIT TRANSACTION;
+    """
+
+
+def load_dataframe(df, table_id, write_disposition, partitioned=True, loader=None):
+    warehouse = get_warehouse()
+    if not is_bigquery():
+        warehouse.load(df[FACT_COLS], table_id, write_disposition, schema=FACT_FIELDS)
+        return
+
+    if (loader or LOADER) == "storage-write":
+        if write_disposition == "WRITE_TRUNCATE" and partitioned:
+            # Full load: staging руу бичээд нэг transaction-оор солино
+            # (TRUNCATE + stream хооронд dashboard хоосон хүснэгт харахгүй)
+            load_dataframe(df, STAGING_TABLE_ID, "WRITE_TRUNCATE", partitioned=False, loader=loader)
+            get_bq_client().query(replace_from_staging_sql(table_id, STAGING_TABLE_ID)).result()
+            return
+        # Storage Write API зөвхөн append хийдэг тул TRUNCATE-ийг тусад нь ажиллуулна
+        if not partitioned:
+            ensure_staging_table(table_id)
+        if write_disposition == "WRITE_TRUNCATE":
+            get_bq_client().query(f"TRUNCATE TABLE `{table_id}`").result()
+        storage_write_dataframe(df, table_id)
+        return
+
+    warehouse.load(
+        df[FACT_COLS],
+        table_id,
+        write_disposition,
+        schema=FACT_FIELDS,
+        job_config=load_job_config(write_disposition, partitioned=partitioned)
     )
 
-    pv_population = (
-        df_population
-        .pivot_table(
-            index=["Хүйс", "Насны бүлэг"],
-            columns="Он",
-            values="DTVAL_CO",
-            aggfunc="sum"
+
+def missing_fact_columns(warehouse):
+    # fact_macro-д дутуу FACT_COLS (хүснэгт байхгүй бол бүгд)
+    existing = warehouse.table_columns(FACT_TABLE_ID) or []
+    return [name for name in FACT_COLS if name not in existing]
+
+
+def load_fact_macro(final_long, load_mode="delta", loader=None):
+    warehouse = get_warehouse()
+    if is_bigquery():
+        table_rebuilt = ensure_fact_table()
+    else:
+        # Шинэ багана нэмэгдсэн бол хуучин мөрүүдийг дүүргэхийн тулд full load
+        table_rebuilt = bool(missing_fact_columns(warehouse))
+    snapshot = read_snapshot() if load_mode == "delta" and not table_rebuilt else None
+
+    if snapshot is None:
+        if load_mode == "delta":
+            logging.info("ℹ️ Snapshot олдсонгүй эсвэл хүснэгт шинэчлэгдсэн → full load (WRITE_TRUNCATE)")
+        load_dataframe(final_long, FACT_TABLE_ID, "WRITE_TRUNCATE", loader=loader)
+        logging.info(f"☁️ BigQuery-д {len(final_long)} мөр (GDP + Population) бичигдлээ")
+    else:
+        delta = diff_against_snapshot(final_long, snapshot)
+        if delta.empty:
+            logging.info("☁️ Өөрчлөлт алга → BigQuery load алгаслаа")
+        else:
+            load_dataframe(delta, STAGING_TABLE_ID, "WRITE_TRUNCATE", partitioned=False, loader=loader)
+            warehouse.merge(FACT_TABLE_ID, STAGING_TABLE_ID, FACT_KEY_COLS, FACT_COLS)
+            logging.info(f"☁️ BigQuery MERGE: {len(delta)} мөр (staging → fact_macro)")
+
+    write_snapshot(final_long)
+
+
+# ---------------------------------------------------------
+# VINTAGE STORE (APPEND-ONLY)
+# ---------------------------------------------------------
+def vintage_schema(fields=None):
+    from google.cloud import bigquery
+    return [bigquery.SchemaField(name, field_type) for name, field_type in fields or VINTAGE_FIELDS]
+
+
+def ensure_vintage_table(table_id=VINTAGE_TABLE_ID):
+    from google.cloud import bigquery
+
+    table = bigquery.Table(table_id, schema=vintage_schema())
+    table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.MONTH,
+        field=VINTAGE_PARTITION_FIELD
+    )
+    table.clustering_fields = VINTAGE_CLUSTERING
+    get_bq_client().create_table(table, exists_ok=True)
+
+
+def ensure_vintage_snapshot_table(table_id=VINTAGE_SNAPSHOT_TABLE_ID):
+    from google.cloud import bigquery
+
+    # Өдрийн partition: as-of хайлт partition metadata-аар огноогоо олоод нэгийг л уншина
+    table = bigquery.Table(table_id, schema=vintage_schema(VINTAGE_SNAPSHOT_FIELDS))
+    table.time_partitioning = bigquery.TimePartitioning(
+        type_=bigquery.TimePartitioningType.DAY,
+        field=VINTAGE_SNAPSHOT_FIELD
+    )
+    table.clustering_fields = VINTAGE_CLUSTERING
+    get_bq_client().create_table(table, exists_ok=True)
+
+
+def _latest_per_key(df):
+    # Түлхүүр бүрийн хамгийн сүүлийн vintage (нэг өдөр олон ажиллавал loaded_at-аар)
+    df = df.sort_values(["vintage_date", "loaded_at"], kind="stable")
+    return df.drop_duplicates(subset=FACT_KEY_COLS, keep="last").reset_index(drop=True)
+
+
+def _read_parquet_dir(path, predicate=None, partitioning=None):
+    import pyarrow.dataset as pds
+
+    dataset = pds.dataset(path, format="parquet", partitioning=partitioning)
+    df = dataset.to_table(filter=predicate).to_pandas()
+    if df.empty:
+        return pd.DataFrame(columns=VINTAGE_COLS)
+    df["vintage_date"] = pd.to_datetime(df["vintage_date"].astype(str)).dt.date
+    return _latest_per_key(df)[VINTAGE_COLS]
+
+
+def vintage_snapshot_dates(snapshot_dir=None):
+    # Partition хавтасны нэрээс (өгөгдөл уншихгүй), ISO тул эрэмбэ нь хронологийн
+    snapshot_dir = snapshot_dir or VINTAGE_SNAPSHOT_DIR
+    if not os.path.isdir(snapshot_dir):
+        return []
+    prefix = f"{VINTAGE_SNAPSHOT_FIELD}="
+    return sorted(name[len(prefix):] for name in os.listdir(snapshot_dir) if name.startswith(prefix))
+
+
+def vintage_as_of(as_of, indicator_codes=None, vintage_dir=None, snapshot_dir=None):
+    # as_of-оос өмнөх хамгийн сүүлийн snapshot partition-ыг л уншина
+    import pyarrow as pa
+    import pyarrow.dataset as pds
+
+    snapshot_dir = snapshot_dir or VINTAGE_SNAPSHOT_DIR
+    as_of = pd.Timestamp(as_of).date().isoformat()
+    codes = (
+        pds.field("indicator_code").isin(list(indicator_codes))
+        if indicator_codes is not None else None
+    )
+
+    dates = [d for d in vintage_snapshot_dates(snapshot_dir) if d <= as_of]
+    if dates:
+        return _read_parquet_dir(
+            os.path.join(snapshot_dir, f"{VINTAGE_SNAPSHOT_FIELD}={dates[-1]}"), codes
         )
-        .reset_index()
+
+    # Анхны snapshot-оос өмнөх огноо: append-only түүхээс (as_of хүртэлх partition)
+    vintage_dir = vintage_dir or VINTAGE_DIR
+    if not os.path.isdir(vintage_dir):
+        return pd.DataFrame(columns=VINTAGE_COLS)
+    predicate = pds.field("vintage_date") <= as_of
+    if codes is not None:
+        predicate &= codes
+    return _read_parquet_dir(
+        vintage_dir, predicate,
+        pds.partitioning(pa.schema([("vintage_date", pa.string())]), flavor="hive")
     )
-    pop_long = pv_population.melt(
-    id_vars=["Хүйс", "Насны бүлэг"],
-    var_name="year",
-    value_name="value"
+
+
+def vintage_as_of_sql(table_id=VINTAGE_TABLE_ID, with_codes=False):
+    # vintage_date partition-оор тайрч, indicator_code/year cluster-оор уншина
+    codes = "AND indicator_code IN UNNEST(@indicator_codes)" if with_codes else ""
+    keys = ", ".join(FACT_KEY_COLS)
+    return f"""
+        SELECT {", ".join(VINTAGE_COLS)}
+        FROM `{table_id}`
+        WHERE vintage_date <= @as_of {codes}
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY {keys}
+            ORDER BY vintage_date DESC, loaded_at DESC
+        ) = 1
+    """
+
+
+def vintage_snapshot_sql(table_id=VINTAGE_SNAPSHOT_TABLE_ID, with_codes=False):
+    # Нэг snapshot partition; нэг өдөр олон ажилласан бол сүүлийнх нь
+    codes = "AND indicator_code IN UNNEST(@indicator_codes)" if with_codes else ""
+    keys = ", ".join(FACT_KEY_COLS)
+    return f"""
+        SELECT {", ".join(VINTAGE_COLS)}
+        FROM `{table_id}`
+        WHERE {VINTAGE_SNAPSHOT_FIELD} = @snapshot_date {codes}
+        QUALIFY ROW_NUMBER() OVER (
+            PARTITION BY {keys}
+            ORDER BY vintage_date DESC, loaded_at DESC
+        ) = 1
+    """
+
+
+def resolve_snapshot_date(as_of, table_id=VINTAGE_SNAPSHOT_TABLE_ID):
+    # as_of-оос өмнөх хамгийн сүүлийн snapshot огноо (байхгүй бол None)
+    as_of = pd.Timestamp(as_of).date()
+    warehouse = get_warehouse()
+    if is_bigquery():
+        # Partition metadata-аас уншина (хүснэгт scan хийхгүй)
+        project, dataset, table = table_id.split(".")
+        df = warehouse.query_to_dataframe(
+            f"""
+            SELECT MAX(partition_id) AS partition_id
+            FROM `{project}.{dataset}.INFORMATION_SCHEMA.PARTITIONS`
+            WHERE table_name = @table_name AND partition_id <= @partition_id
+            """,
+            {"table_name": table, "partition_id": as_of.strftime("%Y%m%d")}
+        )
+        value = df["partition_id"].iloc[0]
+        return None if pd.isna(value) else datetime.strptime(value, "%Y%m%d").date()
+
+    df = warehouse.query_to_dataframe(
+        f"SELECT MAX({VINTAGE_SNAPSHOT_FIELD}) AS snapshot_date FROM `{table_id}` "
+        f"WHERE {VINTAGE_SNAPSHOT_FIELD} <= @as_of",
+        {"as_of": as_of}
     )
-    
-    pop_long["indicator_code"] = "population"
-    pop_long["source"] = "NSO 1212.mn"
-    pop_long["loaded_at"] = pd.Timestamp.utcnow()
-    pop_long["topic"] = "population"
+    value = df["snapshot_date"].iloc[0]
+    return None if pd.isna(value) else pd.Timestamp(value).date()
 
-    
 
-    logging.info("📊 Population pivot OK")
+def query_vintage_as_of(as_of, indicator_codes=None, table_id=VINTAGE_TABLE_ID,
+                        snapshot_table_id=VINTAGE_SNAPSHOT_TABLE_ID):
+    warehouse = get_warehouse()
+    with_codes = indicator_codes is not None
+    codes = {"indicator_codes": [str(c) for c in indicator_codes]} if with_codes else {}
 
-    final_df = (
-        pv_ngdp
-        .merge(pv_rgdp_2005, on="ОН", how="outer")
-        .merge(pv_rgdp_2010, on="ОН", how="outer")
-        .merge(pv_rgdp_2015, on="ОН", how="outer")
-        .merge(pv_growth, on="ОН", how="outer")
+    df = None
+    if warehouse.table_exists(snapshot_table_id):
+        snapshot_date = resolve_snapshot_date(as_of, snapshot_table_id)
+        if snapshot_date is not None:
+            df = warehouse.query_to_dataframe(
+                vintage_snapshot_sql(snapshot_table_id, with_codes),
+                {"snapshot_date": snapshot_date, **codes}
+            )
+
+    # Анхны snapshot-оос өмнөх огноо (эсвэл snapshot хүснэгт үүсээгүй): түүхээс
+    if df is None:
+        if not warehouse.table_exists(table_id):
+            return pd.DataFrame(columns=VINTAGE_COLS)
+        df = warehouse.query_to_dataframe(
+            vintage_as_of_sql(table_id, with_codes),
+            {"as_of": pd.Timestamp(as_of).date(), **codes}
         )
-    final_df = final_df.fillna(0)
+    if not df.empty:
+        df["vintage_date"] = pd.to_datetime(df["vintage_date"]).dt.date
+    return df[VINTAGE_COLS]
 
 
-    # ===================== EXPORT =====================
-    if final_df.empty:
-        raise ValueError("❌ final_df хоосон байна, экспорт хийх боломжгүй")
-    
-    # Багана дараалал (ОН эхэнд)
-    cols = ["ОН"] + [c for c in final_df.columns if c != "ОН"]
-    final_df = final_df[cols]
-    
-    output_file = os.path.join(
-        OUTPUT_DIR,
-        f"GDP_pipeline_{datetime.now().strftime('%Y%m%d')}.xlsx"
-    )
-    
-    with pd.ExcelWriter(output_file, engine="xlsxwriter") as writer:
-        final_df.to_excel(writer, sheet_name="GDP", index=False)
-        pv_population.to_excel(writer, sheet_name="Population", index=False)
-
-        # ===================== LOAD TO BIGQUERY (RAW, NO CHANGE) =====================
-    table_id = "mongol-bank-macro-data.Automation_data.fact_macro"
-
-    # Wide → Long (ямар ч drop / filter хийхгүй)
-    id_col = "ОН"
-    value_cols = [c for c in final_df.columns if c != id_col]
-
-    long_df = final_df.melt(
-        id_vars=id_col,
-        value_vars=value_cols,
-        var_name="indicator_code",
-        value_name="value"
-    )
-
-    long_df = long_df.rename(columns={"ОН": "year"})
-    long_df["source"] = "NSO 1212.mn"
-    long_df["loaded_at"] = pd.Timestamp.utcnow()
-    long_df["topic"] = "gdp" #Sheet name option
-    # ===================== POPULATION → LONG =====================
-    pop_long = pv_population.melt(
-        id_vars=["Хүйс", "Насны бүлэг"],
-        var_name="year",
-        value_name="value"
-    )
-    
-    pop_long = pop_long.rename(columns={
-        "Хүйс": "sex",
-        "Насны бүлэг": "age_group"
+def _write_partitioned(df, root_path, partition_col):
+    # Шинэ файл нэмэхээс өөр юу ч өөрчлөхгүй (append-only)
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    iso = {col: df[col].map(lambda d: d.isoformat()) for col in {"vintage_date", partition_col}}
+    table = pa.Table.from_pandas(df.assign(**iso), preserve_index=False)
+    pq.write_to_dataset(
+        table,
+        root_path=root_path,
+        partition_cols=[partition_col],
+        basename_template=f"part-{time.time_ns()}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore",
+        compression="zstd",
+        use_dictionary=PARQUET_DICT_COLS,
+    )
+
+
+def write_vintage_local(changed, vintage_dir=None):
+    _write_partitioned(changed, vintage_dir or VINTAGE_DIR, "vintage_date")
+
+
+def write_vintage_snapshot_local(snapshot, snapshot_dir=None):
+    _write_partitioned(snapshot, snapshot_dir or VINTAGE_SNAPSHOT_DIR, VINTAGE_SNAPSHOT_FIELD)
+
+
+def latest_vintage(vintage_date, upload=True):
+    # → (хамгийн сүүлийн vintage, local snapshot-ийг шинээр суулгах эсэх)
+    if vintage_snapshot_dates():
+        return vintage_as_of(vintage_date), False
+
+    # Local store (actions/cache) алга: warehouse (үнэний эх сурвалж)-аас сэргээнэ
+    if upload:
+        latest = query_vintage_as_of(vintage_date)
+        logging.info(f"🗂 Vintage: local store алга → warehouse-аас {len(latest)} мөр сэргээлээ")
+    else:
+        latest = vintage_as_of(vintage_date)
+    return latest, True
+
+
+def record_vintage(final_long, vintage_date=None, upload=True):
+    # Өмнөх хамгийн сүүлийн vintage-аас өөрчлөгдсөн нүдийг л бичнэ
+    vintage_date = vintage_date or datetime.now().date()
+    latest, seed = latest_vintage(vintage_date, upload)
+    current = final_long[[c for c in VINTAGE_COLS if c != "vintage_date"]]
+    changed = diff_against_snapshot(current, latest, label="Vintage") if len(latest) else current
+
+    if changed.empty and not seed:
+        logging.info("🗂 Vintage: NSO засвар алга → шинэ vintage бичсэнгүй")
+        return changed
+
+    changed = changed.assign(vintage_date=vintage_date)[VINTAGE_COLS]
+    # Тухайн өдрийн бүтэн төлөв: as-of хайлт зөвхөн энэ partition-ыг уншина
+    snapshot = _latest_per_key(
+        pd.concat([df for df in (latest, changed) if len(df)], ignore_index=True)
+    ).assign(**{VINTAGE_SNAPSHOT_FIELD: vintage_date})
+
+    if upload:
+        warehouse = get_warehouse()
+        history_config = snapshot_config = None
+        if is_bigquery():
+            ensure_vintage_table()
+            ensure_vintage_snapshot_table()
+            history_config = load_job_config("WRITE_APPEND", partitioned=False)
+            history_config.schema = vintage_schema()
+            snapshot_config = load_job_config("WRITE_APPEND", partitioned=False)
+            snapshot_config.schema = vintage_schema(VINTAGE_SNAPSHOT_FIELDS)
+        if not changed.empty:
+            warehouse.load(
+                changed, VINTAGE_TABLE_ID, "WRITE_APPEND",
+                schema=VINTAGE_FIELDS, job_config=history_config
+            )
+        # Зөвхөн local-ийг сэргээж байгаа бол warehouse-ийн snapshot аль хэдийн зөв
+        if not changed.empty or not warehouse.table_exists(VINTAGE_SNAPSHOT_TABLE_ID):
+            warehouse.load(
+                snapshot[VINTAGE_SNAPSHOT_COLS], VINTAGE_SNAPSHOT_TABLE_ID, "WRITE_APPEND",
+                schema=VINTAGE_SNAPSHOT_FIELDS, job_config=snapshot_config
+            )
+    if not changed.empty:
+        write_vintage_local(changed)
+    write_vintage_snapshot_local(snapshot[VINTAGE_SNAPSHOT_COLS])
+
+    logging.info(f"🗂 Vintage {vintage_date}: {len(changed)} нүд, snapshot {len(snapshot)} мөр")
+    return changed
+
+
+# ---------------------------------------------------------
+# DATASET REGISTRY
+# ---------------------------------------------------------
+STAT_VAR_TEXT = "Статистик үзүүлэлт"
+
+
+@dataclass(frozen=True)
+class Dataset:
+    name: str
+    topic: str
+    table_path: str
+    time_dim: str
+    sheet: str
+    freq: str = "Q"
+    # "Статистик үзүүлэлт" хувьсагчаас сонгох утга
+    stat_code: Optional[str] = None
+    # label → indicator_code хөрвүүлэх хэмжигдэхүүн (wide sheet-ийн багана болно)
+    component_dim: Optional[str] = None
+    mapping: dict = field(default_factory=dict)
+    # Задаргааны хэмжигдэхүүн → fact_macro багана (жишээ нь Хүйс → sex)
+    breakdown: dict = field(default_factory=dict)
+    indicator_code: Optional[str] = None
+    # Энэ хэмжигдэхүүний утга бүрээр тусдаа хүсэлт болгон зэрэг татна
+    shard_by: Optional[str] = None
+    # Салбаруудын нийлбэр ДНБ-тэй тэнцэх ёстой түвшний үзүүлэлт эсэх (validation)
+    additive: bool = False
+    # Хувьсагчийн code → сонгох утгууд (заагаагүй бол metadata-ийн бүх утга)
+    selections: dict = field(default_factory=dict)
+
+
+GDP_TABLE = "Economy, environment/National Accounts/DT_NSO_0500_022V1.px"
+POP_TABLE = "Population, household/1_Population, household/DT_NSO_0300_003V1.px"
+
+NGDP_MAP = {
+    "ДНБ": "ngdp",
+    "Хөдөө аж ахуй, ойн аж ахуй, загас барилт, ан агнуур": "ngdp_agri",
+    "Уул уурхай, олборлолт": "ngdp_mine",
+    "Боловсруулах үйлдвэрлэл": "ngdp_manu",
+    "Цахилгаан, хий, уур, агааржуулалт": "ngdp_elec",
+    "Барилга": "ngdp_cons",
+    "Бөөний болон жижиглэн худалдаа, машин, мотоциклийн засвар, үйлчилгээ": "ngdp_trad",
+    "Тээвэр ба агуулахын үйл ажиллагаа": "ngdp_tran",
+    "Мэдээлэл, холбоо": "ngdp_info",
+    "Үйлчилгээний бусад үйл ажиллагаа": "ngdp_oser",
+    "Бүтээгдэхүүний цэвэр татвар": "ngdp_taxe"
+}
+
+
+def _gdp_dataset(name, stat_code, prefix, additive=True):
+    return Dataset(
+        name=name,
+        topic="gdp",
+        table_path=GDP_TABLE,
+        time_dim="ОН",
+        sheet="GDP",
+        stat_code=stat_code,
+        component_dim="Бүрэлдэхүүн",
+        mapping={k: f"{prefix}{v[4:]}" for k, v in NGDP_MAP.items()},
+        additive=additive,
+    )
+
+
+DATASETS = [
+    _gdp_dataset("NGDP", "0", "ngdp"),
+    _gdp_dataset("RGDP 2005", "1", "rgdp_2005"),
+    _gdp_dataset("RGDP 2010", "2", "rgdp_2010"),
+    _gdp_dataset("RGDP 2015", "3", "rgdp_2015"),
+    _gdp_dataset("GDP Growth", "6", "growth", additive=False),
+    Dataset(
+        name="Population",
+        topic="population",
+        table_path=POP_TABLE,
+        time_dim="Он",
+        sheet="Population",
+        freq="Y",
+        breakdown={"Хүйс": "sex", "Насны бүлэг": "age_group"},
+        shard_by="Хүйс",
+        selections={
+            "Хүйс": ["0", "1", "2"],
+            "Насны бүлэг": [str(i) for i in range(16)],
+        },
+    ),
+]
+
+
+# ---------------------------------------------------------
+# DATASET RUNNER
+# ---------------------------------------------------------
+def build_query(metadata, dataset=None):
+    # dataset заагаагүй бол хүснэгтийн бүх нүдийг сонгоно (backfill)
+    query = {"query": [], "response": {"format": "json-stat2"}}
+    for var in metadata["variables"]:
+        if dataset is None:
+            values = var["values"]
+        elif var["text"] == STAT_VAR_TEXT and dataset.stat_code is not None:
+            values = [dataset.stat_code]
+        else:
+            values = dataset.selections.get(var["code"], var["values"])
+        query["query"].append({
+            "code": var["code"],
+            "selection": {"filter": "item", "values": values}
+        })
+    return query
+
+
+def query_cells(query):
+    return int(np.prod([len(q["selection"]["values"]) for q in query["query"]], dtype=np.int64))
+
+
+def plan_query(query, max_cells=None):
+    # Нүдний хязгаараас хэтэрвэл хамгийн том хэмжигдэхүүнээр хувааж chunk болгоно
+    max_cells = max_cells or PXWEB_MAX_CELLS
+    cells = query_cells(query)
+    if cells <= max_cells:
+        return [query]
+
+    sizes = [len(q["selection"]["values"]) for q in query["query"]]
+    axis = int(np.argmax(sizes))
+    values = query["query"][axis]["selection"]["values"]
+    step = max(1, max_cells // (cells // len(values)))
+
+    chunks = []
+    for start in range(0, len(values), step):
+        chunk = {
+            **query,
+            "query": [
+                {**q, "selection": {**q["selection"], "values": values[start:start + step]}}
+                if k == axis else q
+                for k, q in enumerate(query["query"])
+            ]
+        }
+        chunks.extend(plan_query(chunk, max_cells))
+    return chunks
+
+
+def shard_query(query, dim):
+    # dim-ийн утга бүрт нэг query (хувьсагч олдохгүй бол хуваахгүй)
+    for k, q in enumerate(query["query"]):
+        if q["code"] == dim:
+            return [
+                {**query, "query": [
+                    {**other, "selection": {**other["selection"], "values": [value]}}
+                    if j == k else other
+                    for j, other in enumerate(query["query"])
+                ]}
+                for value in q["selection"]["values"]
+            ]
+    return [query]
+
+
+def concat_chunks(frames):
+    if len(frames) == 1:
+        return frames[0]
+
+    df = pd.concat(frames, ignore_index=True)
+    # Chunk бүрийн category дарааллыг хадгалж нэгтгэнэ
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype):
+            df[col] = union_categoricals([f[col] for f in frames])
+
+    dims = [c for c in df.columns if c not in ("DTVAL_CO", "status")]
+    return df.drop_duplicates(subset=dims, keep="last", ignore_index=True)
+
+
+def tidy_dataset(dataset, df):
+    # Задаргаатай dataset-ийг шууд long хэлбэрт (sex/age_group/year categorical хэвээр)
+    long = df.rename(columns={**dataset.breakdown, dataset.time_dim: "year", "DTVAL_CO": "value"})
+    long = long[[*dataset.breakdown.values(), "year", "value"]]
+    long["indicator_code"] = dataset.indicator_code
+    return long
+
+
+def fetch_metadata(table_paths):
+    with ThreadPoolExecutor(max_workers=FETCH_PER_HOST_LIMIT) as pool:
+        return dict(zip(table_paths, pool.map(get_table_metadata, table_paths)))
+
+
+# Гаралтыг өөрчилдөг код (цэвэрлэгээ, тооцоо гэх мэт) өөрчлөгдөх бүрт нэмэгдүүлнэ
+PIPELINE_REVISION = 1
+
+
+def pipeline_version():
+    # NSO хариу ижил ч гаралтын хэлбэр өөрчлөгдвөл хуучин fingerprint хүчингүй болно
+    return fingerprint({
+        "revision": PIPELINE_REVISION,
+        "fact_fields": FACT_FIELDS,
+        "vintage_fields": VINTAGE_FIELDS,
+        "datasets": [asdict(ds) for ds in DATASETS],
+    })
+
+
+def read_fingerprints(version=None):
+    if not os.path.exists(FINGERPRINT_FILE):
+        return {}
+    with open(FINGERPRINT_FILE, encoding="utf-8") as f:
+        state = json.load(f)
+
+    if state.get("pipeline_version") != (version or pipeline_version()):
+        logging.info("🔄 Pipeline-ийн гаралт өөрчлөгдсөн → хуучин fingerprint-ийг тооцохгүй")
+        return {}
+    return state.get("fingerprints", {})
+
+
+def write_fingerprints(fingerprints, version=None):
+    os.makedirs(STATE_DIR, exist_ok=True)
+    tmp = f"{FINGERPRINT_FILE}.tmp"
+    state = {"pipeline_version": version or pipeline_version(), "fingerprints": fingerprints}
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+    os.replace(tmp, FINGERPRINT_FILE)
+
+
+def run_datasets(datasets, previous_fingerprints=None):
+    # → (results эсвэл бүгд өөрчлөгдөөгүй бол None, {dataset: status}, fingerprints)
+    previous_fingerprints = previous_fingerprints or {}
+    metadata = fetch_metadata(sorted({ds.table_path for ds in datasets}))
+
+    jobs, chunk_names = {}, {}
+    for ds in datasets:
+        query = build_query(metadata[ds.table_path], ds)
+        chunks = plan_query(query)
+        if ds.shard_by:
+            chunks = [shard for chunk in chunks for shard in shard_query(chunk, ds.shard_by)]
+        if len(chunks) > 1:
+            logging.info(f"✂️ {ds.name}: {query_cells(query)} нүд → {len(chunks)} chunk")
+
+        names = [ds.name] if len(chunks) == 1 else [
+            f"{ds.name} #{i + 1}/{len(chunks)}" for i in range(len(chunks))
+        ]
+        chunk_names[ds.name] = names
+        for name, chunk in zip(names, chunks):
+            jobs[name] = FetchJob(
+                ds.table_path, chunk,
+                previous_fingerprint=previous_fingerprints.get(name)
+            )
+
+    fetched = fetch_many(jobs)
+    fingerprints = {name: r.fingerprint for name, r in fetched.items()}
+    statuses = {
+        ds.name: (
+            "unchanged" if all(fetched[n].unchanged for n in chunk_names[ds.name])
+            else "changed"
+        )
+        for ds in datasets
+    }
+
+    if all(status == "unchanged" for status in statuses.values()):
+        return None, statuses, fingerprints
+
+    # Зарим dataset өөрчлөгдсөн: export-д зориулж үлдсэнийг нь decode хийнэ
+    for name, r in fetched.items():
+        if r.unchanged:
+            with stage("decode", job=name) as decoded:
+                r.frame = jobs[name].decode(r.raw)
+                decoded["rows"] = len(r.frame)
+            r.raw = None
+
+    results = {}
+    logging.info("⏱ Dataset timing:")
+    for ds in datasets:
+        names = chunk_names[ds.name]
+        with stage("stitch", dataset=ds.name) as stitched:
+            df = concat_chunks([fetched[n].frame for n in names])
+            # Indicator-той dataset-ууд sheet түвшинд long хэлбэрээр нэгтгэгдэнэ
+            results[ds.name] = df if ds.component_dim else tidy_dataset(ds, df)
+            stitched["rows"] = len(results[ds.name])
+
+        fetch_s = max(fetched[n].timing["fetch_s"] for n in names)
+        decode_s = sum(fetched[n].timing["decode_s"] for n in names)
+        logging.info(
+            f"   {ds.name:<12} fetch {fetch_s:>6.2f}s  decode {decode_s:>6.2f}s  "
+            f"stitch {stitched['wall_s']:>6.2f}s  "
+            f"{len(names)} chunk, {stitched['rows']} мөр, {statuses[ds.name]}"
+        )
+    return results, statuses, fingerprints
+
+
+def assemble_indicators(datasets, results):
+    # Stat code бүрийн decode хийсэн frame-ийг нэг long frame болгон нэгтгэж,
+    # wide sheet болон BigQuery-ийн long frame-ийг нэг индекстэй өгөгдлөөс гаргана
+    first = datasets[0]
+
+    with stage("merge", sheet=first.sheet) as merged:
+        stacked = pd.concat(
+            [
+                results[ds.name][[ds.component_dim, ds.time_dim, "DTVAL_CO"]]
+                .set_axis(["label", "year", "value"], axis=1)
+                .assign(dataset=ds.name)
+                for ds in datasets
+            ],
+            ignore_index=True
+        )
+        lookup = pd.DataFrame(
+            [
+                (ds.name, label, code)
+                for ds in datasets
+                for label, code in ds.mapping.items()
+            ],
+            columns=["dataset", "label", "indicator_code"]
+        )
+        # label → indicator_code (бүх dataset-д нэг join)
+        stacked = stacked.astype({"label": "object", "year": "object"})
+        mapped = stacked.merge(lookup, on=["dataset", "label"], how="inner")
+        merged["rows"] = len(mapped)
+
+    if mapped.empty:
+        raise ValueError(f"❌ {first.sheet} хоосон байна, экспорт хийх боломжгүй")
+
+    with stage("pivot", sheet=first.sheet) as pivoted:
+        codes = list(dict.fromkeys(lookup["indicator_code"]))
+        years = list(pd.unique(stacked["year"]))
+
+        # (indicator_code, year) бүрэн тор: wide sheet-ийн багана × мөр
+        series = (
+            mapped
+            .drop_duplicates(subset=["indicator_code", "year"], keep="first")
+            .set_index(["indicator_code", "year"])["value"]
+            # Дутуу улирал NaN хэвээр үлдэнэ (0 болговол YoY тооцоог гуйвуулна)
+            .reindex(pd.MultiIndex.from_product([codes, years], names=["indicator_code", "year"]))
+        )
+        long = series.reset_index()
+
+        # indicator-major дараалал тул reshape нь хуулбаргүй wide view өгнө
+        wide = pd.DataFrame(
+            series.to_numpy().reshape(len(codes), len(years)).T,
+            columns=codes
+        )
+        wide.insert(0, first.time_dim, years)
+        pivoted["rows"] = len(long)
+
+    return wide, long
+
+
+def assemble_sheet(datasets, results):
+    # Нэг sheet-ийн dataset-уудыг wide хэлбэрээр нэгтгээд long хэлбэрт шилжүүлнэ
+    first = datasets[0]
+
+    if first.component_dim:
+        wide, long = assemble_indicators(datasets, results)
+    else:
+        with stage("merge", sheet=first.sheet) as merged:
+            long = pd.concat([results[ds.name] for ds in datasets], ignore_index=True)
+            merged["rows"] = len(long)
+
+        # Long frame-ээс Excel-ийн wide sheet-ийг нэг л удаа гаргана
+        with stage("pivot", sheet=first.sheet) as pivoted:
+            wide = (
+                long.pivot(index=list(first.breakdown.values()), columns="year", values="value")
+                .rename_axis(index=list(first.breakdown), columns=None)
+                .reset_index()
+            )
+            pivoted["rows"] = len(wide)
+
+    # Categorical → string (BigQuery schema-д зориулж)
+    long = long.astype({c: "object" for c in ["year", "sex", "age_group"] if c in long.columns})
+    long["source"] = "NSO 1212.mn"
+    long["loaded_at"] = pd.Timestamp.utcnow()
+    long["topic"] = first.topic
+    long = add_time_columns(long, first.freq)
+    return wide, long
+
+
+# ---------------------------------------------------------
+# VALIDATION
+# ---------------------------------------------------------
+GDP_TOTAL_LABEL = "ДНБ"
+# Өсөлтийн dataset → түүнийг шалгах тогтмол үнийн түвшин
+GROWTH_LEVEL_PAIR = ("GDP Growth", "RGDP 2015")
+
+SECTOR_SUM_TOLERANCE = float(os.environ.get("SECTOR_SUM_TOLERANCE", 0.01))
+GROWTH_TOLERANCE_PP = float(os.environ.get("GROWTH_TOLERANCE_PP", 1.0))
+OUTLIER_Z = float(os.environ.get("OUTLIER_Z", 4.0))
+VALIDATION_BUDGET_S = float(os.environ.get("VALIDATION_BUDGET_S", 10))
+# Хугацаа дуусахад: "skip" — үлдсэн дүрмийг алгасаад үргэлжлүүлнэ, "fail" — ValidationError
+VALIDATION_ON_BUDGET = os.environ.get("VALIDATION_ON_BUDGET", "skip")
+# "warning" бол салбарын нийлбэрийн зөрүү GDP-гүй dataset-уудын load-ыг зогсоохгүй
+SECTOR_SUM_SEVERITY = os.environ.get("SECTOR_SUM_SEVERITY", "error")
+SERIES_KEY_COLS = ["topic", "indicator_code", "sex", "age_group"]
+
+
+class ValidationError(ValueError):
+    def __init__(self, message, report):
+        super().__init__(message)
+        self.report = report
+
+
+@dataclass(frozen=True)
+class Rule:
+    name: str
+    check: Callable
+    # "error" зөрчил гарвал дараагийн дүрмийг ажиллуулахгүй зогсоно
+    severity: str = "error"
+
+
+def _gdp_matrix(long):
+    # period_date × indicator_code матриц (GDP дүрмүүд бүгд үүнийг хуваалцана)
+    gdp = long[long["topic"] == "gdp"]
+    return gdp.set_index(["period_date", "indicator_code"])["value"].unstack().sort_index()
+
+
+def check_completeness(long, ctx):
+    missing = long["value"].isna().to_numpy()
+    return long.loc[missing, ["topic", "indicator_code", "year", "sex", "age_group"]]
+
+
+def check_sector_sums(long, ctx):
+    matrix = ctx["gdp"]
+    violations = []
+    for ds in ctx["datasets"]:
+        if not ds.additive:
+            continue
+        total_code = ds.mapping[GDP_TOTAL_LABEL]
+        part_codes = [c for label, c in ds.mapping.items() if label != GDP_TOTAL_LABEL]
+        if not set(part_codes + [total_code]) <= set(matrix.columns):
+            continue
+
+        total = matrix[total_code].to_numpy()
+        parts = matrix[part_codes].sum(axis=1, min_count=len(part_codes)).to_numpy()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_diff = np.abs(parts - total) / np.abs(total)
+        bad = rel_diff > SECTOR_SUM_TOLERANCE
+        violations.append(pd.DataFrame({
+            "indicator_code": total_code,
+            "period_date": matrix.index[bad],
+            "total": total[bad],
+            "sector_sum": parts[bad],
+            "rel_diff": rel_diff[bad],
+        }))
+    return pd.concat(violations, ignore_index=True) if violations else pd.DataFrame()
+
+
+def check_growth_consistency(long, ctx):
+    # Тайлагнасан YoY өсөлт ≈ тогтмол үнийн түвшний 4 улирлын өөрчлөлт
+    by_name = {ds.name: ds for ds in ctx["datasets"]}
+    growth_name, level_name = GROWTH_LEVEL_PAIR
+    if growth_name not in by_name or level_name not in by_name:
+        return pd.DataFrame()
+
+    matrix = ctx["gdp"]
+    labels = list(by_name[growth_name].mapping)
+    growth_codes = [by_name[growth_name].mapping[label] for label in labels]
+    level_codes = [by_name[level_name].mapping[label] for label in labels]
+    if not set(growth_codes + level_codes) <= set(matrix.columns):
+        return pd.DataFrame()
+
+    levels = matrix[level_codes].to_numpy()
+    reported = matrix[growth_codes].to_numpy()
+    implied = np.full_like(levels, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        implied[4:] = (levels[4:] / levels[:-4] - 1) * 100
+    gap = np.abs(implied - reported)
+
+    rows, cols = np.nonzero(gap > GROWTH_TOLERANCE_PP)
+    return pd.DataFrame({
+        "indicator_code": np.asarray(growth_codes)[cols],
+        "period_date": matrix.index[rows],
+        "reported": reported[rows, cols],
+        "implied": implied[rows, cols],
     })
-    
-    pop_long["topic"] = "population"
-    pop_long["source"] = "NSO 1212.mn"
-    pop_long["loaded_at"] = pd.Timestamp.utcnow()
 
-    pop_long["topic"] = "population"
 
-    # ===================== FINAL MERGE =====================
-    final_long = pd.concat(
-        [long_df, pop_long],
-        ignore_index=True
+def check_outliers(long, ctx):
+    # Цуврал бүрийн үеийн өөрчлөлтийн z-score
+    ordered = long.sort_values(SERIES_KEY_COLS + ["period_date"], kind="stable")
+    series = ordered.groupby(SERIES_KEY_COLS, dropna=False, sort=False)["value"]
+    change = series.diff()
+    grouped = change.groupby([ordered[c] for c in SERIES_KEY_COLS], dropna=False, sort=False)
+    z = (change - grouped.transform("mean")) / grouped.transform("std")
+
+    bad = (z.abs() > OUTLIER_Z).to_numpy()
+    return ordered.loc[bad, SERIES_KEY_COLS + ["year", "value"]].assign(z=z[bad].to_numpy())
+
+
+VALIDATION_RULES = [
+    Rule("sector_sum", check_sector_sums, severity=SECTOR_SUM_SEVERITY),
+    Rule("completeness", check_completeness, severity="warning"),
+    Rule("growth_consistency", check_growth_consistency, severity="warning"),
+    Rule("outlier_z", check_outliers, severity="warning"),
+]
+
+
+def validate(long, datasets=None, rules=None, budget_s=None, on_budget=None):
+    # Long frame дээр дүрмүүдийг дарааллаар; error гарвал зогсоно,
+    # хугацаа дуусвал on_budget-ээр ("skip" | "fail") шийднэ
+    rules = rules or VALIDATION_RULES
+    budget_s = budget_s or VALIDATION_BUDGET_S
+    on_budget = on_budget or VALIDATION_ON_BUDGET
+    if on_budget not in ("skip", "fail"):
+        raise ValueError(f"❌ VALIDATION_ON_BUDGET: 'skip' эсвэл 'fail' байна, '{on_budget}' биш")
+    started = time.perf_counter()
+    ctx = {"datasets": datasets or DATASETS, "gdp": _gdp_matrix(long)}
+
+    report, failed, over_budget = [], None, False
+    for rule in rules:
+        entry = {"rule": rule.name, "severity": rule.severity}
+        over_budget = over_budget or time.perf_counter() - started > budget_s
+        if failed or over_budget:
+            reason = f"{failed} failed" if failed else f"{budget_s}s budget"
+            report.append({**entry, "status": "skipped", "reason": reason, "violations": None})
+            continue
+
+        rule_started = time.perf_counter()
+        violations = rule.check(long, ctx)
+        entry.update(
+            status="ok" if violations.empty else ("failed" if rule.severity == "error" else "warning"),
+            violations=len(violations),
+            wall_s=round(time.perf_counter() - rule_started, 4),
+            sample=json.loads(violations.head(5).to_json(orient="records", date_format="iso", force_ascii=False)),
+        )
+        report.append(entry)
+        if entry["status"] == "failed":
+            failed = rule.name
+
+    logging.info(json.dumps({"event": "validation", "rules": report}, ensure_ascii=False))
+    for entry in report:
+        if entry["status"] in ("failed", "warning"):
+            logging.warning(f"⚠️ Validation {entry['rule']}: {entry['violations']} зөрчил ({entry['status']})")
+        elif entry["status"] == "skipped":
+            logging.warning(f"⏭ Validation {entry['rule']}: алгаслаа ({entry['reason']})")
+
+    if failed:
+        raise ValidationError(f"❌ Validation амжилтгүй: {failed}", report)
+    if over_budget and on_budget == "fail":
+        skipped = [e["rule"] for e in report if e["status"] == "skipped"]
+        raise ValidationError(f"❌ Validation {budget_s}s-д багтсангүй, шалгаагүй: {skipped}", report)
+    return report
+
+
+# ---------------------------------------------------------
+# BACKFILL (ASYNC, RESUMABLE)
+# ---------------------------------------------------------
+def read_checkpoint(path=None):
+    path = path or BACKFILL_CHECKPOINT
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return set(json.load(f)["done"])
+
+
+def write_checkpoint(done, path=None):
+    path = path or BACKFILL_CHECKPOINT
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"done": sorted(done)}, f)
+    os.replace(tmp, path)
+
+
+def _table_slug(table_path):
+    return os.path.splitext(os.path.basename(table_path))[0]
+
+
+def backfill_jobs(sources, metadata):
+    # sources: PxWeb table path эсвэл Dataset → [(chunk key, table_path, payload)]
+    jobs = {}
+    for source in sources:
+        if isinstance(source, Dataset):
+            table_path = source.table_path
+            query = build_query(metadata[table_path], source)
+        else:
+            table_path = source
+            query = build_query(metadata[table_path])
+        for chunk in plan_query(query):
+            key = _cache_key(table_path, chunk)
+            jobs[key] = (key, table_path, chunk)
+    return list(jobs.values())
+
+
+def _write_backfill_chunk(key, table_path, df, output_dir):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    table_dir = os.path.join(output_dir, f"table={_table_slug(table_path)}")
+    os.makedirs(table_dir, exist_ok=True)
+    path = os.path.join(table_dir, f"part-{key[:16]}.parquet")
+    # Checkpoint-д орохоос өмнө файл бүтэн бичигдсэн байна
+    tmp = f"{path}.tmp"
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def _fetch_backfill_chunk(key, table_path, payload, output_dir):
+    with _host_semaphore(nso_url(table_path)):
+        data = get_nso_data(table_path, payload)
+    df = jsonstat_to_dataframe(data)
+    _write_backfill_chunk(key, table_path, df, output_dir)
+    return len(df)
+
+
+async def _backfill_async(jobs, done, concurrency, output_dir, checkpoint_path):
+    semaphore = asyncio.Semaphore(concurrency)
+    progress = {"cells": 0, "chunks": 0}
+    started = time.perf_counter()
+
+    async def run(key, table_path, payload):
+        async with semaphore:
+            # Блоклох requests session-г thread дээр ажиллуулна (pool-ийг хуваалцана)
+            cells = await asyncio.to_thread(
+                _fetch_backfill_chunk, key, table_path, payload, output_dir
+            )
+        done.add(key)
+        write_checkpoint(done, checkpoint_path)
+
+        progress["cells"] += cells
+        progress["chunks"] += 1
+        elapsed = time.perf_counter() - started
+        logging.info(
+            f"📥 Backfill {progress['chunks']}/{len(jobs)}: {_table_slug(table_path)} "
+            f"{cells} нүд ({progress['cells'] / elapsed:,.0f} нүд/s)"
+        )
+
+    await asyncio.gather(*(run(*job) for job in jobs))
+    return progress["cells"], time.perf_counter() - started
+
+
+def backfill(sources, concurrency=None, output_dir=None, checkpoint_path=None, reset=False):
+    # Олон PxWeb хүснэгтийг зэрэг татаж Parquet руу бичнэ; тасарвал үргэлжлүүлнэ
+    concurrency = concurrency or FETCH_MAX_WORKERS
+    output_dir = output_dir or BACKFILL_DIR
+    checkpoint_path = checkpoint_path or BACKFILL_CHECKPOINT
+
+    done = set() if reset else read_checkpoint(checkpoint_path)
+    table_paths = sorted({s.table_path if isinstance(s, Dataset) else s for s in sources})
+    metadata = fetch_metadata(table_paths)
+    jobs = backfill_jobs(sources, metadata)
+    pending = [job for job in jobs if job[0] not in done]
+
+    logging.info(
+        f"🗄 Backfill: {len(table_paths)} хүснэгт, {len(jobs)} chunk "
+        f"({len(jobs) - len(pending)} checkpoint-оос алгаслаа), concurrency {concurrency}"
     )
-    
-    job = bq_client.load_table_from_dataframe(
-        final_long,
-        table_id,
-        job_config=bigquery.LoadJobConfig(
-            write_disposition="WRITE_TRUNCATE"
+    with stage("backfill", tables=len(table_paths)) as recorded:
+        cells, elapsed = asyncio.run(
+            _backfill_async(pending, done, concurrency, output_dir, checkpoint_path)
         )
+        recorded["rows"] = cells
+
+    throughput = cells / elapsed if elapsed else 0.0
+    logging.info(json.dumps({
+        "event": "backfill",
+        "tables": len(table_paths),
+        "chunks": len(pending),
+        "cells": cells,
+        "wall_s": round(elapsed, 3),
+        "cells_per_s": round(throughput, 1),
+    }))
+    return cells
+
+
+def backfill_main(argv=None):
+    parser = argparse.ArgumentParser(description="NSO PxWeb хүснэгтийн түүхэн backfill")
+    parser.add_argument("tables", nargs="*", help="PxWeb хүснэгтийн зам (DT_NSO_*.px)")
+    parser.add_argument(
+        "--registry",
+        action="store_true",
+        help="DATASETS registry-гийн бүх dataset-ийг татна"
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=FETCH_MAX_WORKERS,
+        help="Зэрэг ажиллах хүсэлтийн дээд тоо"
+    )
+    parser.add_argument("--output", default=BACKFILL_DIR, help="Parquet гаргах хавтас")
+    parser.add_argument(
+        "--reset",
+        action="store_true",
+        help="Checkpoint-ийг үл тооцож бүгдийг дахин татна"
     )
+    args = parser.parse_args(argv)
+    if not args.tables and not args.registry:
+        parser.error("хүснэгтийн зам эсвэл --registry заана уу")
 
+    setup_logging()
+    _stage_records.clear()
+    sources = list(args.tables) + (list(DATASETS) if args.registry else [])
+    backfill(sources, args.concurrency, args.output, reset=args.reset)
+    log_http_metrics()
+    log_stage_summary()
 
 
-    job.result()
-    logging.info(f"☁️ BigQuery-д {len(final_long)} мөр (GDP + Population) бичигдлээ")
+# ---------------------------------------------------------
+# MAIN PIPELINE
+# ---------------------------------------------------------
+def main(argv=None):
+    args = parse_args(argv)
+    load_mode = args.load_mode
+    skip_load = args.no_load or args.dry_run
+
+    setup_logging()
+    logging.info(
+        f"🚀 GDP pipeline эхэллээ (load mode: {'skip' if skip_load else load_mode}"
+        f"{', dry-run' if args.dry_run else ''})"
+    )
+    _stage_records.clear()
+    get_warehouse(args.warehouse)
+
+    previous = {} if args.force else read_fingerprints()
+    if previous and not skip_load:
+        # NSO өөрчлөгдөөгүй ч хүснэгтэд шинэ багана дутуу бол load хийх ёстой
+        missing = missing_fact_columns(get_warehouse())
+        if missing:
+            logging.info(f"🧱 fact_macro-д {missing} багана алга → өөрчлөгдсөнд тооцно")
+            previous = {}
+    results, statuses, fingerprints = run_datasets(DATASETS, previous)
+
+    if results is None:
+        logging.info("💤 NSO өгөгдөл өөрчлөгдөөгүй → decode/export/load алгаслаа (--force-оор хүчээр ажиллуулна)")
+        log_run_summary(statuses)
+        log_http_metrics()
+        log_stage_summary()
+        return
+
+    sheets = {}
+    for ds in DATASETS:
+        sheets.setdefault(ds.sheet, []).append(ds)
+
+    wide_frames, long_frames = {}, []
+    for sheet, datasets in sheets.items():
+        wide_frames[sheet], long = assemble_sheet(datasets, results)
+        long_frames.append(long)
+
+    final_long = pd.concat(long_frames, ignore_index=True)
+
+    with stage("validate") as validated:
+        validate(final_long)
+        validated["rows"] = len(final_long)
+
+    if args.dry_run:
+        logging.info(f"🧪 Dry-run: {len(final_long)} мөр бэлэн, export/load алгаслаа")
+        log_run_summary(statuses)
+        log_http_metrics()
+        log_stage_summary()
+        return
+
+    # ===================== EXPORT =====================
+    run_date = datetime.now().strftime('%Y%m%d')
+    output_file = os.path.join(
+        OUTPUT_DIR,
+        f"GDP_pipeline_{run_date}.xlsx"
+    )
+
+    with stage("export", target="xlsx") as exported:
+        exported["rows"] = export_excel(wide_frames, output_file)
+
+    with stage("export", target="parquet") as exported:
+        export_parquet(final_long, run_date)
+        exported["rows"] = len(final_long)
+
+    # ===================== LOAD =====================
+    if skip_load:
+        logging.info("⏭ --no-load: BigQuery load алгаслаа")
+    else:
+        with stage("load", load_mode=load_mode) as loaded:
+            load_fact_macro(final_long, load_mode, loader=args.loader)
+            loaded["rows"] = len(final_long)
+
+        with stage("vintage") as recorded:
+            recorded["rows"] = len(record_vintage(final_long))
+
+        # Load амжилттай болсны дараа л fingerprint шинэчилнэ
+        write_fingerprints(fingerprints)
+
+    log_run_summary(statuses)
+    log_http_metrics()
+    log_stage_summary()
 
-    
     logging.info(f"✅ Pipeline амжилттай дууслаа → {output_file}")
 
 # ---------------------------------------------------------
 # ENTRY POINT
 # ---------------------------------------------------------
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="GDP automation pipeline")
+    parser.add_argument(
+        "--load-mode",
+        choices=["delta", "full"],
+        default=os.environ.get("LOAD_MODE", "delta"),
+        help="delta: зөвхөн шинэ/өөрчлөгдсөн мөрийг MERGE хийнэ, full: WRITE_TRUNCATE"
+    )
+    parser.add_argument(
+        "--loader",
+        choices=["job", "storage-write"],
+        default=LOADER,
+        help="job: load_table_from_dataframe, storage-write: Arrow batch-ийг Storage Write API-аар"
+    )
+    parser.add_argument(
+        "--warehouse",
+        choices=["bigquery", "duckdb"],
+        default=WAREHOUSE,
+        help="duckdb: BigQuery-гийн оронд WAREHOUSE_PATH локал файл руу ачаална"
+    )
+    parser.add_argument(
+        "--no-load",
+        action="store_true",
+        help="Excel/Parquet гаргана, BigQuery руу ачаалахгүй (credential шаардлагагүй)"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="NSO өгөгдөл өөрчлөгдөөгүй байсан ч бүх шатыг ажиллуулна"
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Татаж хөрвүүлнэ, файл бичихгүй, BigQuery руу ачаалахгүй"
+    )
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:2] == ["backfill"]:
+        backfill_main(sys.argv[2:])
+    else:
+        main()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Repo нь package биш тул data_automation / warehouse-ийг шууд import хийнэ
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,226 @@
+# =========================================================
+# TEST FAKES (LOCAL, NO NETWORK / GCP)
+# =========================================================
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# ---------------------------------------------------------
+# STORAGE WRITE API
+# ---------------------------------------------------------
+class FakeWriteClient:
+    # BigQueryWriteClient-ийн pipeline хэрэглэдэг хэсэг.
+    # drop_at: эхний append_rows дуудлагад тухайн request-ийг хадгалсны дараа
+    # ack илгээхээс өмнө холболт тасарна (retry үед ALREADY_EXISTS буцна).
+    # end_early: эхний end_early_calls дуудлага end_early request-ийн дараа
+    # алдаагүйгээр дуусна.
+    def __init__(self, drop_at=None, end_early=None, end_early_calls=0):
+        self.drop_at = drop_at
+        self.end_early = end_early
+        self.end_early_calls = end_early_calls
+        self.batches = {}
+        self.request_sizes = []
+        self.append_calls = 0
+        self.finalized = False
+        self.committed = False
+
+    def table_path(self, project, dataset, table):
+        return f"projects/{project}/datasets/{dataset}/tables/{table}"
+
+    def create_write_stream(self, parent, write_stream):
+        from google.cloud.bigquery_storage_v1 import types
+        return types.WriteStream(name=f"{parent}/streams/fake", type_=write_stream.type_)
+
+    def append_rows(self, requests):
+        from google.api_core import exceptions as gexc
+        from google.cloud.bigquery_storage_v1 import types
+
+        self.append_calls += 1
+        first_call = self.append_calls == 1
+        for i, request in enumerate(requests):
+            if self.append_calls <= self.end_early_calls and i == self.end_early:
+                return
+            self.request_sizes.append(len(request.arrow_rows.rows.serialized_record_batch))
+            if request.offset in self.batches:
+                yield types.AppendRowsResponse(error={"code": 6, "message": "offset exists"})
+                continue
+            self._store(request)
+            if first_call and i == self.drop_at:
+                raise gexc.ServiceUnavailable("connection dropped")
+            yield types.AppendRowsResponse(append_result={"offset": request.offset})
+
+    def _store(self, request):
+        import pyarrow as pa
+
+        schema = pa.ipc.read_schema(
+            pa.py_buffer(request.arrow_rows.writer_schema.serialized_schema)
+        )
+        self.batches[request.offset] = pa.ipc.read_record_batch(
+            pa.py_buffer(request.arrow_rows.rows.serialized_record_batch), schema
+        )
+
+    def finalize_write_stream(self, name):
+        self.finalized = True
+
+    def batch_commit_write_streams(self, request):
+        from google.cloud.bigquery_storage_v1 import types
+        self.committed = True
+        return types.BatchCommitWriteStreamsResponse()
+
+
+# ---------------------------------------------------------
+# BIGQUERY CLIENT (TABLE DDL)
+# ---------------------------------------------------------
+_CTAS_RE = re.compile(
+    r"CREATE(?P<replace> OR REPLACE)? TABLE `(?P<target>[^`]+)`\s+"
+    r"PARTITION BY DATE_TRUNC\((?P<field>\w+), (?P<type>\w+)\)\s+"
+    r"CLUSTER BY (?P<cluster>[\w, ]+?)\s+AS SELECT(?P<select>.*)FROM `(?P<source>[^`]+)`",
+    re.S
+)
+_CAST_RE = re.compile(r"CAST\((\w+) AS (\w+)\) AS (\w+)")
+
+
+class FakeJob:
+    def result(self):
+        return self
+
+
+class FakeBigQueryClient:
+    # ensure_fact_table-д хэрэглэдэг client-ийн хэсэг. Хүснэгт бүрийн мөрийн тоог
+    # хадгалж, BigQuery-ийн дүрмийг дуурайна: CREATE OR REPLACE partition өөрчилж
+    # чадахгүй, copy нь байгаа хүснэгтэд бичихгүй (WRITE_EMPTY).
+    def __init__(self):
+        self.tables = {}
+        self.rows = {}
+        self.ops = []
+        self.queries = []
+
+    def add_table(self, table, rows=0):
+        self.tables[self._id(table)] = table
+        self.rows[self._id(table)] = rows
+
+    @staticmethod
+    def _id(table):
+        if isinstance(table, str):
+            return table
+        return f"{table.project}.{table.dataset_id}.{table.table_id}"
+
+    def get_table(self, table_id):
+        from google.api_core.exceptions import NotFound
+
+        if table_id not in self.tables:
+            raise NotFound(table_id)
+        return self.tables[table_id]
+
+    def create_table(self, table, exists_ok=False):
+        from google.api_core.exceptions import Conflict
+
+        table_id = self._id(table)
+        self.ops.append(("create", table_id))
+        if table_id in self.tables:
+            if exists_ok:
+                return self.tables[table_id]
+            raise Conflict(table_id)
+        self.add_table(table)
+        return table
+
+    def delete_table(self, table_id, not_found_ok=False):
+        from google.api_core.exceptions import NotFound
+
+        self.ops.append(("delete", table_id))
+        if table_id not in self.tables:
+            if not_found_ok:
+                return
+            raise NotFound(table_id)
+        del self.tables[table_id]
+        del self.rows[table_id]
+
+    def update_table(self, table, fields):
+        self.ops.append(("update", self._id(table), tuple(fields)))
+        return table
+
+    def query(self, sql, job_config=None):
+        from google.api_core.exceptions import BadRequest, Conflict, NotFound
+        from google.cloud import bigquery
+
+        self.queries.append(sql)
+        match = _CTAS_RE.search(sql)
+        if match is None:
+            return FakeJob()
+        target, source = match["target"], match["source"]
+        self.ops.append(("ctas", target, source))
+        if source not in self.tables:
+            raise NotFound(source)
+        if target in self.tables:
+            if not match["replace"]:
+                raise Conflict(target)
+            current = self.tables[target].time_partitioning
+            if current is None or (current.field, current.type_) != (match["field"], match["type"]):
+                raise BadRequest("Cannot replace a table with a different partitioning spec")
+
+        table = bigquery.Table(target, schema=[
+            bigquery.SchemaField(name, field_type)
+            for _, field_type, name in _CAST_RE.findall(match["select"])
+        ])
+        table.time_partitioning = bigquery.TimePartitioning(type_=match["type"], field=match["field"])
+        table.clustering_fields = [c.strip() for c in match["cluster"].split(",")]
+        self.tables[target] = table
+        self.rows[target] = self.rows[source]
+        return FakeJob()
+
+    def copy_table(self, source, destination):
+        from google.api_core.exceptions import Conflict
+        from google.cloud import bigquery
+
+        self.ops.append(("copy", source, destination))
+        if destination in self.tables:
+            raise Conflict(destination)
+        original = self.tables[source]
+        table = bigquery.Table(destination, schema=original.schema)
+        table.time_partitioning = original.time_partitioning
+        table.clustering_fields = original.clustering_fields
+        self.add_table(table, self.rows[source])
+        return FakeJob()
+
+
+# ---------------------------------------------------------
+# NSO HTTP STUB
+# ---------------------------------------------------------
+class StubNSOHandler(BaseHTTPRequestHandler):
+    # POST payload-ийн "latency" секунд хүлээгээд payload-ийг буцаана
+    lock = threading.Lock()
+    in_flight = 0
+    max_in_flight = 0
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        cls = type(self)
+        with cls.lock:
+            cls.in_flight += 1
+            cls.max_in_flight = max(cls.max_in_flight, cls.in_flight)
+        try:
+            time.sleep(payload.get("latency", 0))
+        finally:
+            with cls.lock:
+                cls.in_flight -= 1
+
+        body = json.dumps({"path": self.path, **payload}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def start_stub_server():
+    handler = type("Handler", (StubNSOHandler,), {"lock": threading.Lock()})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, handler
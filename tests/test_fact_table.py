@@ -0,0 +1,91 @@
+import pytest
+
+import data_automation as da
+from fakes import FakeBigQueryClient
+
+bigquery = pytest.importorskip("google.cloud.bigquery")
+
+TABLE_ID = da.FACT_TABLE_ID
+MIGRATE_ID = f"{TABLE_ID}{da.FACT_MIGRATE_SUFFIX}"
+LEGACY_FIELDS = ["topic", "indicator_code", "year", "sex", "age_group", "value"]
+
+
+@pytest.fixture
+def client(monkeypatch):
+    client = FakeBigQueryClient()
+    monkeypatch.setattr(da, "get_bq_client", lambda: client)
+    return client
+
+
+def table(fields, partitioning=None, clustering=None):
+    t = bigquery.Table(TABLE_ID, schema=[bigquery.SchemaField(n, "STRING") for n in fields])
+    t.time_partitioning = partitioning
+    t.clustering_fields = clustering
+    return t
+
+
+def assert_fact_layout(client):
+    t = client.tables[TABLE_ID]
+    spec = da.fact_partitioning()
+    assert (t.time_partitioning.field, t.time_partitioning.type_) == (spec.field, spec.type_)
+    assert list(t.clustering_fields) == da.FACT_CLUSTERING
+    assert [f.name for f in t.schema] == da.FACT_COLS
+
+
+def test_creates_missing_table(client):
+    assert da.ensure_fact_table() is True
+    assert_fact_layout(client)
+    assert client.ops == [("create", TABLE_ID)]
+
+
+@pytest.mark.parametrize("existing", [
+    # Baseline: partition/cluster-гүй
+    table(LEGACY_FIELDS),
+    # Өөр partition төрөл
+    table(da.FACT_COLS, bigquery.TimePartitioning(type_="DAY", field="period_date"), da.FACT_CLUSTERING),
+    # Өөр cluster
+    table(da.FACT_COLS, da.fact_partitioning(), ["topic"]),
+], ids=["unpartitioned", "wrong-partitioning", "wrong-clustering"])
+def test_migrates_wrong_layout_through_temp_table(client, existing):
+    client.add_table(existing, rows=1234)
+
+    assert da.ensure_fact_table() is True
+
+    assert_fact_layout(client)
+    # Хуучин мөрүүд load дуусах хүртэл dashboard-д харагдана
+    assert client.rows[TABLE_ID] == 1234
+    assert MIGRATE_ID not in client.tables
+    # Хуучин хүснэгтийг шинэ layout бэлэн болсны ДАРАА л устгана
+    ops = [op[:2] for op in client.ops]
+    assert ops.index(("ctas", MIGRATE_ID)) < ops.index(("delete", TABLE_ID)) < ops.index(("copy", MIGRATE_ID))
+
+
+def test_failed_rebuild_keeps_old_table(client, monkeypatch):
+    client.add_table(table(LEGACY_FIELDS), rows=10)
+
+    def broken_query(sql, job_config=None):
+        raise RuntimeError("query failed")
+    monkeypatch.setattr(client, "query", broken_query)
+
+    with pytest.raises(RuntimeError):
+        da.ensure_fact_table()
+    assert client.rows[TABLE_ID] == 10
+    assert client.tables[TABLE_ID].time_partitioning is None
+
+
+def test_adds_missing_columns_in_place(client):
+    old_cols = [c for c in da.FACT_COLS if c not in da.FACT_TIME_COLS]
+    client.add_table(table(old_cols, da.fact_partitioning(), da.FACT_CLUSTERING), rows=5)
+
+    assert da.ensure_fact_table() is True
+
+    assert client.ops == [("update", TABLE_ID, ("schema",))]
+    assert [f.name for f in client.tables[TABLE_ID].schema] == old_cols + da.FACT_TIME_COLS
+    assert client.rows[TABLE_ID] == 5
+
+
+def test_matching_table_is_untouched(client):
+    client.add_table(table(da.FACT_COLS, da.fact_partitioning(), da.FACT_CLUSTERING))
+
+    assert da.ensure_fact_table() is False
+    assert client.ops == []
@@ -0,0 +1,62 @@
+import time
+
+import pandas as pd
+import pytest
+
+import data_automation as da
+from fakes import start_stub_server
+
+
+@pytest.fixture
+def nso(monkeypatch):
+    server, handler = start_stub_server()
+    monkeypatch.setattr(da, "NSO_API_URL", f"http://127.0.0.1:{server.server_port}/api")
+    monkeypatch.setattr(da, "HTTP_CACHE_ENABLED", False)
+    monkeypatch.setattr(da, "_session", None)
+    monkeypatch.setattr(da, "_host_semaphores", {})
+    yield handler
+    server.shutdown()
+    server.server_close()
+
+
+def jobs_with_latency(latencies):
+    return {
+        f"table_{i}": da.FetchJob(
+            f"table_{i}.px",
+            {"latency": latency},
+            decode=lambda data: pd.DataFrame([data])
+        )
+        for i, latency in enumerate(latencies)
+    }
+
+
+def test_wall_time_close_to_slowest_request(nso, monkeypatch):
+    monkeypatch.setattr(da, "FETCH_PER_HOST_LIMIT", 8)
+    latencies = [0.1, 0.2, 0.3, 0.4, 0.5, 0.6]
+
+    started = time.perf_counter()
+    results = da.fetch_many(jobs_with_latency(latencies), max_workers=8)
+    wall = time.perf_counter() - started
+
+    assert sorted(results) == [f"table_{i}" for i in range(len(latencies))]
+    for i, latency in enumerate(latencies):
+        frame = results[f"table_{i}"].frame
+        assert frame.loc[0, "latency"] == latency
+        assert frame.loc[0, "path"] == f"/api/table_{i}.px"
+    # Дараалсан бол ~2.1s; зэрэгцээ бол хамгийн удаан (0.6s)-д ойр
+    assert wall < max(latencies) + 0.3
+    assert nso.max_in_flight == len(latencies)
+
+
+def test_per_host_limit(nso, monkeypatch):
+    monkeypatch.setattr(da, "FETCH_PER_HOST_LIMIT", 2)
+    latency, n_jobs = 0.2, 6
+
+    started = time.perf_counter()
+    results = da.fetch_many(jobs_with_latency([latency] * n_jobs), max_workers=n_jobs)
+    wall = time.perf_counter() - started
+
+    assert len(results) == n_jobs
+    assert nso.max_in_flight == 2
+    # 6 хүсэлт / 2 зэрэг → дор хаяж 3 давалгаа
+    assert wall >= latency * n_jobs / 2 - 0.05
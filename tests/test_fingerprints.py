@@ -0,0 +1,34 @@
+import json
+
+import pytest
+
+import data_automation as da
+
+
+@pytest.fixture
+def state_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(da, "STATE_DIR", str(tmp_path))
+    monkeypatch.setattr(da, "FINGERPRINT_FILE", str(tmp_path / "fingerprints.json"))
+    return tmp_path
+
+
+def test_round_trip(state_dir):
+    da.write_fingerprints({"NGDP": "abc"})
+    assert da.read_fingerprints() == {"NGDP": "abc"}
+
+
+def test_output_change_invalidates(state_dir, monkeypatch):
+    da.write_fingerprints({"NGDP": "abc"})
+    monkeypatch.setattr(da, "PIPELINE_REVISION", da.PIPELINE_REVISION + 1)
+    assert da.read_fingerprints() == {}
+
+
+def test_schema_change_invalidates(state_dir, monkeypatch):
+    da.write_fingerprints({"NGDP": "abc"})
+    monkeypatch.setattr(da, "FACT_FIELDS", da.FACT_FIELDS + [("extra", "STRING")])
+    assert da.read_fingerprints() == {}
+
+
+def test_legacy_flat_file_is_ignored(state_dir):
+    (state_dir / "fingerprints.json").write_text(json.dumps({"NGDP": "abc"}))
+    assert da.read_fingerprints() == {}
@@ -0,0 +1,108 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import data_automation as da
+
+
+def cube(dims, value, status=None, index_style="list"):
+    # dims: [(id, [(code, label), ...]), ...]
+    dimension = {}
+    for dim, categories in dims:
+        codes = [code for code, _ in categories]
+        if index_style == "dict":
+            # {code: position} — dict-ийн дараалал position-тэй таарахгүй
+            index = {code: pos for pos, code in reversed(list(enumerate(codes)))}
+        elif index_style == "none":
+            index = None
+        else:
+            index = codes
+        category = {"label": dict(categories)}
+        if index is not None:
+            category["index"] = index
+        dimension[dim] = {"category": category}
+
+    data = {
+        "id": [dim for dim, _ in dims],
+        "size": [len(categories) for _, categories in dims],
+        "dimension": dimension,
+        "value": value,
+    }
+    if status is not None:
+        data["status"] = status
+    return data
+
+
+DIMS = [
+    ("ОН", [("0", "2023"), ("1", "2024")]),
+    ("Бүрэлдэхүүн", [("a", "ДНБ"), ("b", "Барилга"), ("c", "Уул уурхай")]),
+]
+
+
+def expected_rows(dims):
+    return list(itertools.product(*[[label for _, label in cats] for _, cats in dims]))
+
+
+def test_dense_list_row_major_order():
+    df = da.jsonstat_to_dataframe(cube(DIMS, [1, 2, 3, 4, 5, 6]))
+
+    assert list(zip(df["ОН"], df["Бүрэлдэхүүн"])) == expected_rows(DIMS)
+    assert df["DTVAL_CO"].tolist() == [1, 2, 3, 4, 5, 6]
+    assert isinstance(df["ОН"].dtype, pd.CategoricalDtype)
+    assert "status" not in df.columns
+
+
+def test_sparse_value_dict():
+    df = da.jsonstat_to_dataframe(cube(DIMS, {"0": 1.5, "4": 2.5}))
+
+    assert len(df) == 6
+    assert df["DTVAL_CO"].iloc[0] == 1.5
+    assert df["DTVAL_CO"].iloc[4] == 2.5
+    assert df["DTVAL_CO"].isna().sum() == 4
+
+
+def test_empty_sparse_value_dict():
+    df = da.jsonstat_to_dataframe(cube(DIMS, {}))
+    assert len(df) == 6
+    assert df["DTVAL_CO"].isna().all()
+
+
+def test_status_string_applies_to_every_cell():
+    df = da.jsonstat_to_dataframe(cube(DIMS, [1] * 6, status="p"))
+    assert df["status"].tolist() == ["p"] * 6
+
+
+def test_status_sparse_dict():
+    df = da.jsonstat_to_dataframe(cube(DIMS, [1] * 6, status={"2": "e"}))
+    assert df["status"].iloc[2] == "e"
+    assert df["status"].drop(index=2).isna().all()
+
+
+def test_status_list():
+    status = ["a", None, "b", None, None, "a"]
+    df = da.jsonstat_to_dataframe(cube(DIMS, [1] * 6, status=status))
+    assert df["status"].astype(object).where(df["status"].notna(), None).tolist() == status
+
+
+@pytest.mark.parametrize("index_style", ["list", "dict", "none"])
+def test_category_index_ordering(index_style):
+    # dict index: {code: position}; position-оор эрэмбэлнэ (dict-ийн дараалал биш)
+    df = da.jsonstat_to_dataframe(cube(DIMS, [1, 2, 3, 4, 5, 6], index_style=index_style))
+    assert list(zip(df["ОН"], df["Бүрэлдэхүүн"])) == expected_rows(DIMS)
+
+
+def test_duplicate_labels_share_category():
+    dims = [("ОН", [("0", "2024"), ("1", "2024"), ("2", "2025")])]
+    df = da.jsonstat_to_dataframe(cube(dims, [1, 2, 3]))
+
+    assert df["ОН"].tolist() == ["2024", "2024", "2025"]
+    assert list(df["ОН"].cat.categories) == ["2024", "2025"]
+
+
+def test_size_defaults_to_label_count():
+    data = cube(DIMS, list(range(6)))
+    del data["size"]
+    df = da.jsonstat_to_dataframe(data)
+    assert np.array_equal(df["DTVAL_CO"].to_numpy(), np.arange(6, dtype=np.float64))
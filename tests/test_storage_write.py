@@ -0,0 +1,116 @@
+import datetime
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+import data_automation as da
+from fakes import FakeBigQueryClient, FakeWriteClient
+
+pytest.importorskip("google.cloud.bigquery_storage_v1")
+
+MAX_BYTES = 256 * 1024
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(da, "_backoff_delay", lambda attempt: 0)
+
+
+def fact_frame(n=20_000):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        "topic": "gdp",
+        "indicator_code": rng.choice(["ngdp", "rgdp_2015_mining"], n),
+        "year": "2024-3",
+        "period_date": datetime.date(2024, 7, 1),
+        "year_num": 2024,
+        "period": 3,
+        "freq": "Q",
+        "period_key": 202403,
+        "sex": None,
+        "age_group": None,
+        # Мөр бүр өвөрмөц утгатай → давхардал/алдагдлыг шууд илрүүлнэ
+        "value": np.arange(n, dtype=np.float64),
+        "source": "NSO 1212.mn",
+        "loaded_at": pd.Timestamp("2024-08-01", tz="UTC"),
+    })
+
+
+@pytest.mark.parametrize("mode", ["pending", "committed"])
+@pytest.mark.parametrize("drop_at", [None, 0, 3])
+def test_exactly_once_under_retry(mode, drop_at):
+    df = fact_frame()
+    client = FakeWriteClient(drop_at=drop_at)
+
+    written = da.storage_write_dataframe(
+        df, "p.d.fact_macro", mode=mode, write_client=client, max_bytes=MAX_BYTES
+    )
+
+    offsets = sorted(client.batches)
+    assert len(offsets) > 3
+    assert offsets[0] == 0
+    for current, following in zip(offsets, offsets[1:]):
+        assert current + client.batches[current].num_rows == following
+
+    stored = pa.Table.from_batches([client.batches[o] for o in offsets]).to_pandas()
+    assert written == len(df) == len(stored)
+    assert stored["value"].tolist() == df["value"].tolist()
+
+    assert max(client.request_sizes) <= MAX_BYTES
+    assert client.append_calls == (1 if drop_at is None else 2)
+    assert client.finalized
+    assert client.committed == (mode == "pending")
+
+
+def test_arrow_batches_respect_max_bytes():
+    table = pa.Table.from_pandas(
+        fact_frame()[da.FACT_COLS], schema=da.fact_arrow_schema(), preserve_index=False
+    )
+    batches = da.arrow_batches(table, max_bytes=MAX_BYTES)
+
+    assert sum(b.num_rows for b in batches) == table.num_rows
+    assert all(b.serialize().size <= MAX_BYTES for b in batches)
+
+
+def test_stream_ending_early_is_resumed():
+    df = fact_frame()
+    client = FakeWriteClient(end_early=2, end_early_calls=1)
+
+    written = da.storage_write_dataframe(df, "p.d.fact_macro", write_client=client, max_bytes=MAX_BYTES)
+
+    stored = pa.Table.from_batches([client.batches[o] for o in sorted(client.batches)]).to_pandas()
+    assert written == len(stored) == len(df)
+    assert client.append_calls == 2
+
+
+def test_stream_ending_early_forever_gives_up():
+    from google.api_core import exceptions as gexc
+
+    client = FakeWriteClient(end_early=1, end_early_calls=10 ** 6)
+
+    with pytest.raises(gexc.Aborted):
+        da.storage_write_dataframe(fact_frame(), "p.d.fact_macro", write_client=client, max_bytes=MAX_BYTES)
+    assert client.append_calls == da.HTTP_MAX_RETRIES + 1
+
+
+def test_full_load_swaps_staging_in_one_transaction(monkeypatch):
+    bq_client = FakeBigQueryClient()
+    written = []
+    monkeypatch.setattr(da, "get_bq_client", lambda: bq_client)
+    monkeypatch.setattr(da, "is_bigquery", lambda: True)
+    monkeypatch.setattr(da, "get_warehouse", lambda kind=None: None)
+    monkeypatch.setattr(da, "storage_write_dataframe", lambda df, table_id: written.append(table_id))
+
+    da.load_dataframe(fact_frame(10), da.FACT_TABLE_ID, "WRITE_TRUNCATE", loader="storage-write")
+
+    # fact_macro-г хэзээ ч TRUNCATE хийхгүй; зөвхөн staging руу stream хийнэ
+    assert written == [da.STAGING_TABLE_ID]
+    assert bq_client.queries[0].strip() == f"TRUNCATE TABLE `{da.STAGING_TABLE_ID}`"
+    swap = " ".join(bq_client.queries[1].split())
+    assert swap.startswith("BEGIN TRANSACTION;")
+    assert f"DELETE FROM `{da.FACT_TABLE_ID}` WHERE TRUE;" in swap
+    assert f"INSERT INTO `{da.FACT_TABLE_ID}`" in swap and f"FROM `{da.STAGING_TABLE_ID}`" in swap
+    assert swap.endswith("COMMIT TRANSACTION;")
+    assert len(bq_client.queries) == 2
@@ -0,0 +1,84 @@
+import datetime
+import logging
+
+import pandas as pd
+import pytest
+
+import data_automation as da
+
+DATASET = da.DATASETS[0]
+PERIODS = [datetime.date(2024, m, 1) for m in (1, 4, 7)]
+
+
+def gdp_long(total=100.0):
+    # Салбаруудын нийлбэр 100; total-оор зөрүү үүсгэнэ
+    codes = [c for label, c in DATASET.mapping.items() if label != da.GDP_TOTAL_LABEL]
+    rows = [(code, 100.0 / len(codes)) for code in codes] + [(DATASET.mapping[da.GDP_TOTAL_LABEL], total)]
+    return pd.DataFrame([
+        {"topic": "gdp", "indicator_code": code, "year": str(p), "period_date": p,
+         "sex": None, "age_group": None, "value": value}
+        for p in PERIODS for code, value in rows
+    ])
+
+
+def rules(sector_severity="error"):
+    return [
+        da.Rule("sector_sum", da.check_sector_sums, severity=sector_severity),
+        da.Rule("completeness", da.check_completeness, severity="warning"),
+    ]
+
+
+def statuses(report):
+    return {e["rule"]: e["status"] for e in report}
+
+
+def test_clean_data_passes():
+    report = da.validate(gdp_long(), [DATASET], rules())
+    assert statuses(report) == {"sector_sum": "ok", "completeness": "ok"}
+
+
+def test_sector_sum_error_aborts():
+    with pytest.raises(da.ValidationError) as exc:
+        da.validate(gdp_long(total=150.0), [DATASET], rules())
+    assert statuses(exc.value.report) == {"sector_sum": "failed", "completeness": "skipped"}
+
+
+def test_sector_sum_severity_warning_does_not_abort():
+    report = da.validate(gdp_long(total=150.0), [DATASET], rules("warning"))
+    assert statuses(report) == {"sector_sum": "warning", "completeness": "ok"}
+    assert report[0]["violations"] == len(PERIODS)
+
+
+def slow_rules():
+    def slow(long, ctx):
+        return pd.DataFrame()
+    return [da.Rule("slow", slow, severity="warning")] + rules()
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Дүрэм бүр 1s зарцуулна
+    ticks = iter(range(1000))
+    monkeypatch.setattr(da.time, "perf_counter", lambda: float(next(ticks)))
+
+
+def test_budget_skip_is_explicit(clock, caplog):
+    with caplog.at_level(logging.WARNING):
+        report = da.validate(gdp_long(), [DATASET], slow_rules(), budget_s=0.5, on_budget="skip")
+
+    skipped = [e for e in report if e["status"] == "skipped"]
+    assert [e["rule"] for e in skipped] == ["slow", "sector_sum", "completeness"]
+    assert all(e["reason"] == "0.5s budget" for e in skipped)
+    assert "алгаслаа (0.5s budget)" in caplog.text
+
+
+def test_budget_fail_raises(clock):
+    with pytest.raises(da.ValidationError) as exc:
+        da.validate(gdp_long(), [DATASET], slow_rules(), budget_s=1.5, on_budget="fail")
+    assert statuses(exc.value.report)["slow"] == "ok"
+    assert statuses(exc.value.report)["completeness"] == "skipped"
+
+
+def test_unknown_budget_policy_rejected():
+    with pytest.raises(ValueError):
+        da.validate(gdp_long(), [DATASET], rules(), on_budget="ignore")
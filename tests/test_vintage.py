@@ -0,0 +1,100 @@
+import datetime
+import shutil
+
+import pandas as pd
+import pytest
+
+import data_automation as da
+
+pytest.importorskip("duckdb")
+from warehouse import DuckDBWarehouse  # noqa: E402
+
+D1, D2, D3 = datetime.date(2024, 1, 10), datetime.date(2024, 4, 10), datetime.date(2024, 7, 10)
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    warehouse = DuckDBWarehouse()
+    monkeypatch.setattr(da, "get_warehouse", lambda kind=None: warehouse)
+    monkeypatch.setattr(da, "VINTAGE_DIR", str(tmp_path / "vintages"))
+    monkeypatch.setattr(da, "VINTAGE_SNAPSHOT_DIR", str(tmp_path / "vintage_snapshots"))
+    return warehouse
+
+
+def fact(values, loaded_at="2024-01-10"):
+    rows = [
+        ("gdp", "ngdp", "2023-4", None, None),
+        ("gdp", "ngdp_mine", "2023-4", None, None),
+        ("population", "population", "2023", "Эрэгтэй", "0-4"),
+    ]
+    df = pd.DataFrame(rows, columns=["topic", "indicator_code", "year", "sex", "age_group"])
+    df["period_date"] = datetime.date(2023, 10, 1)
+    df["value"] = values
+    df["loaded_at"] = pd.Timestamp(loaded_at, tz="UTC")
+    return df
+
+
+def history_rows(warehouse):
+    return len(warehouse.query_to_dataframe(f"SELECT * FROM `{da.VINTAGE_TABLE_ID}`"))
+
+
+def values(df):
+    return dict(zip(df["indicator_code"], df["value"]))
+
+
+def test_records_only_changed_cells(store):
+    assert len(da.record_vintage(fact([1.0, 2.0, 3.0]), D1)) == 3
+    assert len(da.record_vintage(fact([1.0, 2.5, 3.0], "2024-04-10"), D2)) == 1
+    assert len(da.record_vintage(fact([1.0, 2.5, 3.0], "2024-07-10"), D3)) == 0
+    assert history_rows(store) == 4
+
+
+def test_as_of_reads_one_snapshot_partition(store, tmp_path):
+    da.record_vintage(fact([1.0, 2.0, 3.0]), D1)
+    da.record_vintage(fact([1.0, 2.5, 3.0], "2024-04-10"), D2)
+
+    assert values(da.vintage_as_of(D1))["ngdp_mine"] == 2.0
+    assert values(da.vintage_as_of(datetime.date(2024, 3, 1)))["ngdp_mine"] == 2.0
+
+    # Түүх болон бусад snapshot-гүйгээр ч хамгийн сүүлийн as-of зөв
+    shutil.rmtree(tmp_path / "vintages")
+    shutil.rmtree(tmp_path / "vintage_snapshots" / f"snapshot_date={D1.isoformat()}")
+    latest = da.vintage_as_of(D3)
+    assert values(latest) == {"ngdp": 1.0, "ngdp_mine": 2.5, "population": 3.0}
+    assert set(latest["vintage_date"]) == {D1, D2}
+    assert values(da.vintage_as_of(D3, indicator_codes=["ngdp_mine"])) == {"ngdp_mine": 2.5}
+
+
+def test_warehouse_as_of_matches_local(store):
+    da.record_vintage(fact([1.0, 2.0, 3.0]), D1)
+    da.record_vintage(fact([1.0, 2.5, 3.0], "2024-04-10"), D2)
+
+    for as_of in (D1, datetime.date(2024, 3, 1), D3):
+        remote = da.query_vintage_as_of(as_of).sort_values("indicator_code")
+        local = da.vintage_as_of(as_of).sort_values("indicator_code")
+        assert values(remote) == values(local)
+        assert list(remote["vintage_date"]) == list(local["vintage_date"])
+    assert da.query_vintage_as_of(datetime.date(2023, 1, 1)).empty
+
+
+def test_evicted_local_store_is_rebuilt_from_warehouse(store, tmp_path):
+    da.record_vintage(fact([1.0, 2.0, 3.0]), D1)
+    da.record_vintage(fact([1.0, 2.5, 3.0], "2024-04-10"), D2)
+    shutil.rmtree(tmp_path / "vintages")
+    shutil.rmtree(tmp_path / "vintage_snapshots")
+
+    # Өөрчлөлтгүй өгөгдлийг дахин бүтэн vintage болгон бичихгүй
+    assert da.record_vintage(fact([1.0, 2.5, 3.0], "2024-07-10"), D3).empty
+    assert history_rows(store) == 4
+    snapshots = store.query_to_dataframe(f"SELECT DISTINCT snapshot_date FROM `{da.VINTAGE_SNAPSHOT_TABLE_ID}`")
+    assert len(snapshots) == 2
+    assert da.vintage_snapshot_dates() == [D3.isoformat()]
+    assert values(da.vintage_as_of(D3))["ngdp_mine"] == 2.5
+
+
+def test_history_fallback_before_first_snapshot(store):
+    # Snapshot хүснэгтээс өмнөх түүх (migration): QUALIFY-аар
+    history = fact([1.0, 2.0, 3.0]).assign(vintage_date=D1)[da.VINTAGE_COLS]
+    store.load(history, da.VINTAGE_TABLE_ID, schema=da.VINTAGE_FIELDS)
+
+    assert values(da.query_vintage_as_of(D2)) == {"ngdp": 1.0, "ngdp_mine": 2.0, "population": 3.0}
@@ -0,0 +1,84 @@
+import pandas as pd
+import pytest
+
+import warehouse as wh
+
+pytest.importorskip("duckdb")
+
+TABLE_ID = "proj.macro.fact_macro"
+STAGING_ID = "proj.macro.fact_macro_staging"
+SCHEMA = [("indicator_code", "STRING"), ("sex", "STRING"), ("age_group", "STRING"), ("value", "FLOAT64")]
+KEY_COLS = ["indicator_code", "sex", "age_group"]
+COLS = [name for name, _ in SCHEMA]
+
+
+@pytest.fixture
+def warehouse():
+    return wh.DuckDBWarehouse(":memory:")
+
+
+def frame(rows):
+    return pd.DataFrame(rows, columns=COLS)
+
+
+def test_warehouse_is_abstract():
+    with pytest.raises(TypeError):
+        wh.Warehouse()
+
+
+def test_to_duckdb_sql_quotes_backtick_table():
+    sql = wh.to_duckdb_sql("SELECT * FROM `proj.macro.fact_macro` WHERE year = @year")
+    assert sql == 'SELECT * FROM "proj.macro.fact_macro" WHERE year = $year'
+
+
+def test_to_duckdb_sql_rewrites_unnest_param():
+    sql = wh.to_duckdb_sql("WHERE indicator_code IN UNNEST(@codes) AND topic in unnest( @topics )")
+    assert sql == "WHERE indicator_code IN (SELECT UNNEST($codes)) AND topic IN (SELECT UNNEST($topics))"
+
+
+def test_query_with_list_param(warehouse):
+    warehouse.load(frame([("ngdp", None, None, 1.0), ("cpi", None, None, 2.0)]), TABLE_ID, schema=SCHEMA)
+
+    df = warehouse.query_to_dataframe(
+        f"SELECT indicator_code FROM `{TABLE_ID}` WHERE indicator_code IN UNNEST(@codes)",
+        {"codes": ["cpi"], "unused": 1},
+    )
+    assert df["indicator_code"].tolist() == ["cpi"]
+
+
+def test_load_truncate_and_append(warehouse):
+    warehouse.load(frame([("ngdp", None, None, 1.0)]), TABLE_ID, "WRITE_TRUNCATE", schema=SCHEMA)
+    warehouse.load(frame([("cpi", None, None, 2.0)]), TABLE_ID, "WRITE_APPEND", schema=SCHEMA)
+    assert warehouse.query_to_dataframe(f"SELECT count(*) AS n FROM `{TABLE_ID}`")["n"][0] == 2
+
+    warehouse.load(frame([("rgdp", None, None, 3.0)]), TABLE_ID, "WRITE_TRUNCATE", schema=SCHEMA)
+    df = warehouse.query_to_dataframe(f"SELECT * FROM `{TABLE_ID}`")
+    assert df["indicator_code"].tolist() == ["rgdp"]
+    # Бүгд NULL багана ч schema-ийн төрлөө авна
+    assert warehouse.table_columns(TABLE_ID) == COLS
+    assert warehouse.table_columns("proj.macro.missing") is None
+
+
+def test_merge_matches_null_keys(warehouse):
+    warehouse.load(frame([
+        ("pop", None, None, 1.0),
+        ("pop", "Эрэгтэй", None, 2.0),
+        ("pop", "Эрэгтэй", "0-4", 3.0),
+    ]), TABLE_ID, schema=SCHEMA)
+    warehouse.load(frame([
+        ("pop", None, None, 10.0),
+        ("pop", "Эрэгтэй", "0-4", 30.0),
+        ("pop", "Эмэгтэй", None, 40.0),
+    ]), STAGING_ID, "WRITE_TRUNCATE", schema=SCHEMA)
+
+    warehouse.merge(TABLE_ID, STAGING_ID, KEY_COLS, COLS)
+
+    df = warehouse.query_to_dataframe(f"SELECT * FROM `{TABLE_ID}`")
+    got = {(r.sex, r.age_group): r.value for r in df.astype(object).where(df.notna(), None).itertuples()}
+    # NULL түлхүүр IFNULL-аар таарч шинэчлэгдэнэ, давхардахгүй
+    assert got == {
+        (None, None): 10.0,
+        ("Эрэгтэй", None): 2.0,
+        ("Эрэгтэй", "0-4"): 30.0,
+        ("Эмэгтэй", None): 40.0,
+    }
@@ -0,0 +1,250 @@
+# =========================================================
+# WAREHOUSE (BIGQUERY / LOCAL DUCKDB)
+# =========================================================
+# Pipeline болон dashboard нэг интерфэйсээр BigQuery эсвэл
+# локал DuckDB файл руу бичиж уншина (GCP-гүйгээр турших).
+
+import re
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+
+
+def merge_sql(target, staging, key_cols, columns):
+    def key_match(col):
+        return f"IFNULL(T.{col}, '') = IFNULL(S.{col}, '')"
+
+    on = " AND ".join(key_match(c) for c in key_cols)
+    update_cols = [c for c in columns if c not in key_cols]
+    return f"""
+        MERGE `{target}` T
+        USING `{staging}` S
+        ON {on}
+        WHEN MATCHED THEN
+            UPDATE SET {", ".join(f"{c} = S.{c}" for c in update_cols)}
+        WHEN NOT MATCHED THEN
+            INSERT ({", ".join(columns)})
+            VALUES ({", ".join(f"S.{c}" for c in columns)})
+    """
+
+
+class Warehouse(ABC):
+    @abstractmethod
+    def load(self, df, table_id, write_disposition="WRITE_APPEND", schema=None, job_config=None):
+        # schema: [(name, BigQuery type)] — pandas-аас төрөл таахгүй
+        ...
+
+    @abstractmethod
+    def merge(self, target, staging, key_cols, columns):
+        ...
+
+    @abstractmethod
+    def query_to_dataframe(self, sql, params=None):
+        ...
+
+    @abstractmethod
+    def query_to_arrow(self, sql, params=None):
+        ...
+
+    @abstractmethod
+    def table_exists(self, table_id):
+        ...
+
+    @abstractmethod
+    def table_columns(self, table_id):
+        # Баганын нэрс; хүснэгт байхгүй бол None
+        ...
+
+
+# ---------------------------------------------------------
+# BIGQUERY
+# ---------------------------------------------------------
+def _bq_type(value):
+    if isinstance(value, bool):
+        return "BOOL"
+    if isinstance(value, int):
+        return "INT64"
+    if isinstance(value, float):
+        return "FLOAT64"
+    if isinstance(value, datetime):
+        return "TIMESTAMP"
+    if isinstance(value, date):
+        return "DATE"
+    return "STRING"
+
+
+def bq_query_parameters(params):
+    # {"as_of": date, "codes": [...]} → BigQuery query parameter-ууд
+    from google.cloud import bigquery
+
+    query_params = []
+    for name, value in (params or {}).items():
+        if isinstance(value, (list, tuple)):
+            elem_type = _bq_type(value[0]) if value else "STRING"
+            query_params.append(bigquery.ArrayQueryParameter(name, elem_type, list(value)))
+        else:
+            query_params.append(bigquery.ScalarQueryParameter(name, _bq_type(value), value))
+    return query_params
+
+
+class BigQueryWarehouse(Warehouse):
+    def __init__(self, client=None, client_factory=None):
+        # client_factory: credential шаардлагатай client-ийг анх хэрэглэх үед үүсгэнэ
+        self._client = client
+        self._client_factory = client_factory
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = self._client_factory()
+        return self._client
+
+    def load(self, df, table_id, write_disposition="WRITE_APPEND", schema=None, job_config=None):
+        from google.cloud import bigquery
+
+        if job_config is None:
+            job_config = bigquery.LoadJobConfig(write_disposition=write_disposition)
+            if schema:
+                job_config.schema = [bigquery.SchemaField(n, t) for n, t in schema]
+        self.client.load_table_from_dataframe(df, table_id, job_config=job_config).result()
+
+    def merge(self, target, staging, key_cols, columns):
+        self.client.query(merge_sql(target, staging, key_cols, columns)).result()
+
+    def query_to_dataframe(self, sql, params=None):
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(query_parameters=bq_query_parameters(params))
+        return self.client.query(sql, job_config=job_config).result().to_dataframe()
+
+    def query_to_arrow(self, sql, params=None):
+        from google.cloud import bigquery
+
+        job_config = bigquery.QueryJobConfig(query_parameters=bq_query_parameters(params))
+        return self.client.query(sql, job_config=job_config).result().to_arrow()
+
+    def table_exists(self, table_id):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            self.client.get_table(table_id)
+            return True
+        except NotFound:
+            return False
+
+    def table_columns(self, table_id):
+        from google.api_core.exceptions import NotFound
+
+        try:
+            return [field.name for field in self.client.get_table(table_id).schema]
+        except NotFound:
+            return None
+
+
+# ---------------------------------------------------------
+# LOCAL (DUCKDB)
+# ---------------------------------------------------------
+_BACKTICK_RE = re.compile(r"`([^`]+)`")
+_UNNEST_PARAM_RE = re.compile(r"IN\s+UNNEST\(\s*@(\w+)\s*\)", re.IGNORECASE)
+_PARAM_RE = re.compile(r"@(\w+)")
+
+DUCKDB_TYPES = {
+    "STRING": "VARCHAR",
+    "INT64": "BIGINT",
+    "FLOAT64": "DOUBLE",
+    "BOOL": "BOOLEAN",
+    "DATE": "DATE",
+    "TIMESTAMP": "TIMESTAMPTZ",
+}
+
+
+def duckdb_table(table_id):
+    # "project.dataset.table" → нэг quoted identifier (BigQuery-ийн FQN хэвээр)
+    return '"' + table_id.replace('"', '""') + '"'
+
+
+def to_duckdb_sql(sql):
+    # BigQuery SQL-ийн dashboard/pipeline-д хэрэглэдэг хэсгийг DuckDB руу буулгана
+    sql = _BACKTICK_RE.sub(lambda m: duckdb_table(m.group(1)), sql)
+    sql = _UNNEST_PARAM_RE.sub(r"IN (SELECT UNNEST($\1))", sql)
+    return _PARAM_RE.sub(r"$\1", sql)
+
+
+class DuckDBWarehouse(Warehouse):
+    def __init__(self, path=":memory:", read_only=False):
+        try:
+            import duckdb
+        except ImportError as exc:
+            raise ImportError("❌ Локал warehouse-д duckdb хэрэгтэй: pip install duckdb") from exc
+
+        self.path = path
+        # Dashboard зэрэг уншигч process-ууд read_only-оор нээнэ
+        self._con = duckdb.connect(path, read_only=read_only)
+        # DuckDB connection нэг thread-д зориулагдсан тул түгжинэ
+        self._lock = threading.Lock()
+
+    def _execute(self, sql, params=None):
+        if params:
+            used = set(re.findall(r"\$(\w+)", sql))
+            params = {k: v for k, v in params.items() if k in used}
+        return self._con.execute(sql, params or None)
+
+    def load(self, df, table_id, write_disposition="WRITE_APPEND", schema=None, job_config=None):
+        table = duckdb_table(table_id)
+        # Бүгд NULL багана зэргийг BigQuery-тэй ижил төрөлтэй болгоно
+        select = ", ".join(
+            f'CAST("{name}" AS {DUCKDB_TYPES[field_type]}) AS "{name}"'
+            for name, field_type in schema
+        ) if schema else "*"
+        with self._lock:
+            self._con.register("_load_df", df)
+            try:
+                if write_disposition == "WRITE_TRUNCATE" or not self._exists(table_id):
+                    self._con.execute(f"CREATE OR REPLACE TABLE {table} AS SELECT {select} FROM _load_df")
+                else:
+                    self._con.execute(f"INSERT INTO {table} BY NAME SELECT {select} FROM _load_df")
+            finally:
+                self._con.unregister("_load_df")
+
+    def merge(self, target, staging, key_cols, columns):
+        # MERGE-ийн UPDATE + INSERT-тэй ижил үр дүн: таарсан мөрийг устгаад дахин оруулна
+        t, s = duckdb_table(target), duckdb_table(staging)
+        on = " AND ".join(f"IFNULL(T.{c}, '') = IFNULL(S.{c}, '')" for c in key_cols)
+        cols = ", ".join(columns)
+        with self._lock:
+            self._con.execute("BEGIN TRANSACTION")
+            try:
+                self._con.execute(f"DELETE FROM {t} T WHERE EXISTS (SELECT 1 FROM {s} S WHERE {on})")
+                self._con.execute(f"INSERT INTO {t} ({cols}) SELECT {cols} FROM {s}")
+                self._con.execute("COMMIT")
+            except Exception:
+                self._con.execute("ROLLBACK")
+                raise
+
+    def query_to_dataframe(self, sql, params=None):
+        with self._lock:
+            return self._execute(to_duckdb_sql(sql), params).df()
+
+    def query_to_arrow(self, sql, params=None):
+        with self._lock:
+            return self._execute(to_duckdb_sql(sql), params).fetch_arrow_table()
+
+    def _exists(self, table_id):
+        row = self._con.execute(
+            "SELECT count(*) FROM information_schema.tables WHERE table_name = ?",
+            [table_id]
+        ).fetchone()
+        return row[0] > 0
+
+    def table_exists(self, table_id):
+        with self._lock:
+            return self._exists(table_id)
+
+    def table_columns(self, table_id):
+        with self._lock:
+            rows = self._con.execute(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_name = ? ORDER BY ordinal_position",
+                [table_id]
+            ).fetchall()
+        return [row[0] for row in rows] or None